@@ -138,7 +138,7 @@ customize_step create-user \
 uv run pycomms/pycomms.py init-crypto
 
 customize_step setup-pycomms \
-  --install python3-cryptography,python3-netifaces \
+  --install python3-cryptography \
   --run-command 'mkdir -p /opt/pycomms/' \
   --copy-in pycomms/pycomms.py:/opt/pycomms/ \
   --copy-in crypto/pycomms-key:/opt/pycomms/ \
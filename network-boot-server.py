@@ -1,9 +1,7 @@
 #!/usr/bin/env -S uv run --script
 # /// script
 # requires-python = ">=3.12"
-# dependencies = [
-#   "tftpy",
-# ]
+# dependencies = []
 # ///
 
 """
@@ -22,20 +20,32 @@ import os
 import time
 import signal
 import subprocess
-import threading
+import shutil
 import logging
+import logging.handlers
+import queue
 import argparse
 import socket
 import struct
+import fnmatch
+import contextlib
+import collections
+import concurrent.futures
+import functools
+import selectors
+import errno
+import json
+import ctypes
+import traceback
+import mmap
 from pathlib import Path
-from http.server import HTTPServer, SimpleHTTPRequestHandler
 
-# Try to import tftpy, provide helpful message if not available
+# libguestfs' Python binding ships with the distro (python3-libguestfs / python-guestfs), not PyPI,
+# so it is optional - without it the kernel and initrd are extracted through a host NBD device
 try:
-    import tftpy
+    import guestfs
 except ImportError:
-    print("Error: tftpy library not found. Install it with: pip install tftpy")
-    sys.exit(1)
+    guestfs = None
 
 # Network configuration
 NETWORK_SUBNET = "172.16.172.0/24"
@@ -49,10 +59,28 @@ TFTP_PORT = 69
 HTTP_PORT = 80
 NBD_PORT = 10809
 
+# Delay before restarting an NBD server that died, doubled while it keeps dying early
+NBD_RESTART_DELAY = 1.0
+NBD_RESTART_DELAY_MAX = 60.0
+NBD_STABLE_SECONDS = 30  # Running at least this long resets the delay
+
 # Directories
 WORK_DIR = "/tmp/pxeboot"
 TFTP_ROOT = f"{WORK_DIR}/tftp"
 HTTP_ROOT = f"{WORK_DIR}/http"
+RAW_IMAGE_PATH = f"{WORK_DIR}/disk.raw"
+
+# Common locations for syslinux files (ordered by priority)
+SYSLINUX_PATHS = [
+    '/usr/lib/syslinux/bios',           # Arch Linux, modern systems
+    '/usr/lib/syslinux/modules/bios',   # Debian/Ubuntu
+    '/usr/lib/syslinux',                # Older systems
+    '/usr/share/syslinux',              # Fedora/RHEL
+    '/usr/lib/PXELINUX',                # Some Debian variants
+]
+
+# Required files for BIOS PXE boot
+SYSLINUX_FILES = ['lpxelinux.0', 'ldlinux.c32', 'menu.c32', 'libutil.c32']
 
 # Configure logging
 logging.basicConfig(
@@ -62,6 +90,324 @@ logging.basicConfig(
 logger = logging.getLogger('PXEBootServer')
 
 
+def start_log_listener():
+    """Hand log records to a background thread, so the event loop never blocks writing to stderr"""
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+# Batched UDP I/O - the stdlib socket module has no recvmmsg/sendmmsg, so bind them from libc
+UDP_BATCH_SIZE = 64
+UDP_BATCH_BUF_SIZE = 1024
+
+try:
+    _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+    _libc.recvmmsg
+    _libc.sendmmsg
+except (OSError, AttributeError):
+    _libc = None
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ('sin_family', ctypes.c_ushort),
+        ('sin_port', ctypes.c_uint16),  # Network byte order
+        ('sin_addr', ctypes.c_uint32),  # Network byte order
+        ('sin_zero', ctypes.c_uint8 * 8),
+    ]
+
+    def get(self):
+        """Return the address as an (ip, port) tuple"""
+        key = (self.sin_addr, self.sin_port)
+        addr = _sin_addr_tuples.get(key)
+        if addr is None:
+            addr = _sin_addr_tuples[key] = (
+                socket.inet_ntoa(self.sin_addr.to_bytes(4, sys.byteorder)), socket.ntohs(self.sin_port))
+        return addr
+
+    def set(self, addr):
+        """Fill in the address from an (ip, port) tuple"""
+        sin_addr = _sin_addrs.get(addr[0])
+        if sin_addr is None:
+            ip = '255.255.255.255' if addr[0] == '<broadcast>' else addr[0]
+            sin_addr = _sin_addrs[addr[0]] = int.from_bytes(socket.inet_aton(ip), sys.byteorder)
+        self.sin_addr = sin_addr
+        self.sin_port = socket.htons(addr[1])
+
+
+# Destination address string -> sin_addr value, replies go to a handful of addresses at most
+_sin_addrs = {}
+
+# (sin_addr, sin_port) -> sender tuple. Every DHCP client sends from 0.0.0.0:68 until it has
+# a lease, so a boot storm converts one address instead of one per packet.
+_sin_addr_tuples = {}
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+if _libc is not None:
+    _libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    _libc.recvmmsg.restype = ctypes.c_int
+    _libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    _libc.sendmmsg.restype = ctypes.c_int
+
+# Classic BPF socket filters (SO_ATTACH_FILTER), run by the kernel before a datagram is queued
+SO_ATTACH_FILTER = 26
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_uint16), ('jt', ctypes.c_uint8), ('jf', ctypes.c_uint8), ('k', ctypes.c_uint32)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.POINTER(_SockFilter))]
+
+
+# Accept only BOOTREQUESTs carrying the DHCP magic cookie. On a UDP socket the filter sees the
+# packet from the UDP header, so the DHCP payload starts at offset 8; loads past the end of a
+# short datagram make the filter drop it.
+DHCP_REQUEST_FILTER = [
+    (0x30, 0, 0, 8),                # ldb [8]           - BOOTP op
+    (0x15, 0, 3, 1),                # jeq #1 (BOOTREQUEST), else drop
+    (0x20, 0, 0, 8 + 236),          # ld  [244]         - magic cookie
+    (0x15, 0, 1, 0x63825363),       # jeq #0x63825363, else drop
+    (0x06, 0, 0, 0xffffffff),       # ret #-1           - keep the whole datagram
+    (0x06, 0, 0, 0),                # ret #0            - drop
+]
+
+
+def attach_socket_filter(sock, program):
+    """Attach a classic BPF program, given as (code, jt, jf, k) tuples, to a socket"""
+    instructions = (_SockFilter * len(program))(*[_SockFilter(*insn) for insn in program])
+    fprog = _SockFprog(len(program), instructions)
+    # The kernel copies the program during setsockopt, so the ctypes buffers can go afterwards
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, bytes(fprog))
+
+
+DHCP_MAGIC_COOKIE = b'\x63\x82\x53\x63'
+
+# Kernel queue for the DHCP socket, deep enough to hold a whole rack's DISCOVERs while the event
+# loop is busy elsewhere. Clamped to net.core.rmem_max/wmem_max, raise those to get all of it:
+#   sysctl -w net.core.rmem_max=12582912 net.core.wmem_max=12582912
+DHCP_SOCKET_BUF_SIZE = 12 << 20
+
+# BOOTP reply header up to and including the magic cookie: op, htype, hlen, hops, (xid), secs,
+# flags, (ciaddr, yiaddr), siaddr, (giaddr, chaddr, sname, file), cookie - 240 bytes
+DHCP_REPLY_HEADER = struct.Struct("!BBBB4xHH8x4s4x16x64x128x4s")
+
+# Fixed-width DHCP reply options 53, 54, 51, 1, 3, 6 and 43 packed in one call
+DHCP_FIXED_OPTIONS = struct.Struct("!BBB BB4s BB4s BB4s BB4s BB4s BB3s".replace(" ", ""))
+_dhcp_string_options = {}
+
+# DHCP option code/length header and 16-bit option values
+DHCP_OPTION_HEADER = struct.Struct("!BB")
+DHCP_OPTION_U16 = struct.Struct("!H")
+
+
+def _dhcp_string_option(length):
+    """Compiled struct for a code/length/value option with a `length` byte value"""
+    option = _dhcp_string_options.get(length)
+    if option is None:
+        option = _dhcp_string_options[length] = struct.Struct(f"!BB{length}s")
+    return option
+
+
+# Handlers for the request options the server acts on, each gets (result, packet, value offset, length)
+def _dhcp_opt_msg_type(result, mv, i, length):
+    result['msg_type'] = mv[i]
+
+
+def _dhcp_opt_vendor_class(result, mv, i, length):
+    result['vendor_class'] = bytes(mv[i:i + length])
+
+
+def _dhcp_opt_requested_ip(result, mv, i, length):
+    result['requested_ip'] = bytes(mv[i:i + 4])
+
+
+def _dhcp_opt_client_arch(result, mv, i, length):
+    # This is a 2-byte value
+    if length >= 2:
+        result['client_arch'] = DHCP_OPTION_U16.unpack_from(mv, i)[0]
+
+
+DHCP_OPTION_HANDLERS = {
+    53: _dhcp_opt_msg_type,  # DHCP Message Type
+    60: _dhcp_opt_vendor_class,  # Vendor Class Identifier
+    50: _dhcp_opt_requested_ip,  # Requested IP Address
+    93: _dhcp_opt_client_arch,  # Client System Architecture
+}
+
+
+class UDPBatch:
+    """Pre-allocated mmsghdr/iovec pools for draining and answering a UDP socket in batches"""
+
+    def __init__(self, sock, size=UDP_BATCH_SIZE, buf_size=UDP_BATCH_BUF_SIZE):
+        self.sock = sock
+        self.size = size
+        self.tx_count = 0
+
+        # One receive and one transmit slot per batch entry, allocated once and reused
+        self.rx_bufs = [bytearray(buf_size) for _ in range(size)]
+        self.tx_bufs = [bytearray(buf_size) for _ in range(size)]
+        self._rx_names = (_SockAddrIn * size)()
+        self._tx_names = (_SockAddrIn * size)()
+        self._rx_iovs = (_IOVec * size)()
+        self._tx_iovs = (_IOVec * size)()
+        self._rx_msgs = (_MMsgHdr * size)()
+        self._tx_msgs = (_MMsgHdr * size)()
+
+        for i in range(size):
+            self._rx_iovs[i].iov_base = ctypes.addressof((ctypes.c_char * buf_size).from_buffer(self.rx_bufs[i]))
+            self._rx_iovs[i].iov_len = buf_size
+            self._tx_iovs[i].iov_base = ctypes.addressof((ctypes.c_char * buf_size).from_buffer(self.tx_bufs[i]))
+
+            for msgs, names, iovs in ((self._rx_msgs, self._rx_names, self._rx_iovs),
+                                      (self._tx_msgs, self._tx_names, self._tx_iovs)):
+                hdr = msgs[i].msg_hdr
+                hdr.msg_name = ctypes.addressof(names[i])
+                hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+                hdr.msg_iov = ctypes.pointer(iovs[i])
+                hdr.msg_iovlen = 1
+            self._tx_names[i].sin_family = socket.AF_INET
+
+        self._rx_lens = [0] * size
+        self._rx_views = [memoryview(buf) for buf in self.rx_bufs]
+
+    def recv(self):
+        """Drain up to `size` datagrams without blocking, returns the number received"""
+        if _libc is None:
+            # No recvmmsg, but still fill the whole batch so the caller's drain loop behaves the same
+            for i in range(self.size):
+                try:
+                    self._rx_lens[i], addr = self.sock.recvfrom_into(self.rx_bufs[i], 0, socket.MSG_DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    return i
+                self._rx_names[i].set(addr)
+            return self.size
+
+        for i in range(self.size):
+            self._rx_msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+        n = _libc.recvmmsg(self.sock.fileno(), self._rx_msgs, self.size, socket.MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return 0
+            raise OSError(err, os.strerror(err))
+        for i in range(n):
+            self._rx_lens[i] = self._rx_msgs[i].msg_len
+        return n
+
+    def packet(self, i):
+        """Payload and (ip, port) sender of received datagram i.
+
+        The payload is a view into the receive buffer, only valid until the next recv().
+        """
+        return self._rx_views[i][:self._rx_lens[i]], self._rx_names[i].get()
+
+    def queue(self, payload, addr):
+        """Stage a datagram for the next flush(), flushing early if the batch is full"""
+        if self.tx_count == self.size:
+            self.flush()
+        i = self.tx_count
+        self.tx_bufs[i][:len(payload)] = payload
+        self._tx_iovs[i].iov_len = len(payload)
+        self._tx_names[i].set(addr)
+        self.tx_count += 1
+
+    def flush(self):
+        """Send every staged datagram without blocking, returns the number sent.
+
+        If the socket send buffer is full the rest of the batch is dropped rather than stalling
+        the event loop - UDP clients (DHCP, TFTP) retransmit on their own timers anyway.
+        """
+        count, self.tx_count = self.tx_count, 0
+        if _libc is None:
+            for i in range(count):
+                try:
+                    self.sock.sendto(memoryview(self.tx_bufs[i])[:self._tx_iovs[i].iov_len], self._tx_names[i].get())
+                except BlockingIOError:
+                    logger.warning("Send buffer full, dropped %d queued datagram(s)", count - i)
+                    return i
+            return count
+
+        sent = 0
+        while sent < count:
+            n = _libc.sendmmsg(self.sock.fileno(), ctypes.byref(self._tx_msgs[sent]), count - sent, socket.MSG_DONTWAIT)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    logger.warning("Send buffer full, dropped %d queued datagram(s)", count - sent)
+                    break
+                raise OSError(err, os.strerror(err))
+            sent += n
+        return sent
+
+
+# TFTP (RFC 1350, options from RFC 2347/2348/2349/7440)
+TFTP_RRQ = 1
+TFTP_DATA = 3
+TFTP_ACK = 4
+TFTP_ERROR = 5
+TFTP_OACK = 6
+TFTP_ERR_NOT_FOUND = 1
+TFTP_ERR_ACCESS = 2
+TFTP_ERR_ILLEGAL_OP = 4
+TFTP_ERR_OPTION = 8
+TFTP_BLOCK_SIZE = 512
+TFTP_TIMEOUT = 2  # Seconds before an unacknowledged packet is resent
+TFTP_RETRIES = 5
+TFTP_MAX_WINDOW = 64  # Largest windowsize granted, in blocks
+TFTP_SOCKET_BUF_SIZE = 1 << 20
+TFTP_HEADER = struct.Struct("!HH")  # opcode, block number / error code
+TFTP_OPCODE = struct.Struct("!H")
+
+
+# PXE client system architectures (DHCP option 93)
+ARCH_NAMES = {
+    0x0000: "BIOS/Legacy x86",
+    0x0006: "EFI IA32",
+    0x0007: "EFI BC x64",
+    0x0009: "EFI x64",
+    0x000a: "EFI ARM 32-bit",
+    0x000b: "EFI ARM 64-bit",
+}
+
+# Bootloader served to each client architecture; clients that omit option 93 are BIOS
+BOOTFILE_BY_ARCH = {
+    0x0007: "grubx64.efi",  # EFI x64 - GRUB EFI
+    0x0009: "grubx64.efi",
+    0x0006: "grubia32.efi",  # EFI IA32 - GRUB IA32
+    0x0000: "lpxelinux.0",  # BIOS/Legacy - SYSLINUX
+    None: "lpxelinux.0",
+}
+
+
 class DHCPServer:
     """Simple DHCP server with PXE support"""
     
@@ -73,6 +419,9 @@ class DHCPServer:
     DHCPOFFER = 2
     DHCPREQUEST = 3
     DHCPACK = 5
+
+    # Offset of the option 53 value inside a reply built from the template
+    DHCP_MSG_TYPE_OFFSET = 242
     
     def __init__(self, interface, server_ip, range_start, range_end, netmask):
         self.interface = interface
@@ -80,10 +429,28 @@ class DHCPServer:
         self.range_start = range_start
         self.range_end = range_end
         self.netmask = netmask
-        self.lease_pool = {}
-        self.next_ip = self._ip_to_int(range_start)
         self.running = False
+
+        # Packed/encoded forms of the server's own addresses, converted once
+        self._server_ip_packed = socket.inet_aton(server_ip)
+        self._netmask_packed = socket.inet_aton(netmask)
+        self._server_ip_ascii = server_ip.encode('ascii')
         self.sock = None
+
+        # Leases as MAC -> integer address, least recently seen client first, so a full pool
+        # hands out the address of whichever client has been quiet the longest
+        self._leases = collections.OrderedDict()
+        self._pool = range(self._ip_to_int(range_start), self._ip_to_int(range_end) + 1)
+        self._free_ips = collections.deque(self._pool)
+
+        # Everything in a reply except xid, yiaddr, chaddr, message type and bootfile is fixed
+        self._reply_template = self._build_reply_template()
+        self._bootfile_templates = {}
+        self._packed_ips = {}
+
+        # Per-client reply, MAC -> (bootfile, packet), reused for every OFFER/ACK to that client.
+        # Only clients in _leases get one, and lose it with their lease, so both stay pool-sized.
+        self._client_packets = {}
         
     def _ip_to_int(self, ip):
         """Convert IP address string to integer"""
@@ -92,209 +459,300 @@ class DHCPServer:
     def _int_to_ip(self, num):
         """Convert integer to IP address string"""
         return socket.inet_ntoa(struct.pack("!I", num))
-    
+
     def _allocate_ip(self, mac):
-        """Allocate an IP address for a MAC address"""
-        if mac in self.lease_pool:
-            return self.lease_pool[mac]
-        
-        ip = self._int_to_ip(self.next_ip)
-        self.lease_pool[mac] = ip
-        self.next_ip += 1
-        
-        # Wrap around if we exceed the range
-        if self.next_ip > self._ip_to_int(self.range_end):
-            self.next_ip = self._ip_to_int(self.range_start)
-        
+        """Allocate an IP address for a MAC address, returned as an integer"""
+        leases = self._leases
+        ip = leases.get(mac)
+        if ip is not None:
+            leases.move_to_end(mac)
+            return ip
+
+        if self._free_ips:
+            ip = self._free_ips.popleft()
+        else:
+            # Pool exhausted - take over the least recently seen client's address
+            evicted, ip = leases.popitem(last=False)
+            self._client_packets.pop(evicted, None)
+            logger.warning("DHCP pool exhausted, reassigning %s from %s", self._int_to_ip(ip), evicted.hex(':'))
+
+        leases[mac] = ip
         return ip
-    
+
     def _get_arch_name(self, arch_code):
         """Get human-readable architecture name"""
         if arch_code is None:
             return "Not specified (likely BIOS)"
-        arch_names = {
-            0x0000: "BIOS/Legacy x86",
-            0x0006: "EFI IA32",
-            0x0007: "EFI BC x64",
-            0x0009: "EFI x64",
-            0x000a: "EFI ARM 32-bit",
-            0x000b: "EFI ARM 64-bit",
-        }
-        return arch_names.get(arch_code, f"Unknown (0x{arch_code:04x})")
+        return ARCH_NAMES.get(arch_code) or f"Unknown (0x{arch_code:04x})"
 
     def _get_bootfile_for_arch(self, arch_code):
         """Get appropriate bootloader file for client architecture"""
-
-        if arch_code in (0x0007, 0x0009):  # EFI x64
-            logger.info("  → UEFI x64 client - using GRUB EFI")
-            return "grubx64.efi"
-        elif arch_code == 0x0006:  # EFI IA32
-            logger.info("  → UEFI IA32 client - using GRUB IA32")
-            return "grubia32.efi"
-        elif arch_code == 0x0000 or arch_code is None:  # BIOS
-            logger.info("  → BIOS/Legacy client - using SYSLINUX")
-            return "lpxelinux.0"
-        else:
-            logger.warning(f"  → Unknown architecture - defaulting to BIOS")
-            return "lpxelinux.0"
-
-    def _build_dhcp_packet(self, transaction_id, client_mac, client_ip, msg_type, bootfile='lpxelinux.0'):
-        """Build a DHCP packet"""
-        packet = bytearray(300)
-
-        # BOOTP header
-        packet[0] = 2  # Boot Reply
-        packet[1] = 1  # Ethernet
-        packet[2] = 6  # Hardware address length
-        packet[3] = 0  # Hops
-
-        # Transaction ID
-        packet[4:8] = transaction_id
-
-        # Seconds elapsed
-        packet[8:10] = b'\x00\x00'
-
-        # Flags - Don't force broadcast for UEFI, let client decide
-        packet[10:12] = b'\x00\x00'
-
-        # Client IP (ciaddr) - empty for DISCOVER
-        packet[12:16] = b'\x00' * 4
-
-        # Your IP (yiaddr) - the offered IP
-        packet[16:20] = socket.inet_aton(client_ip)
-
-        # Server IP (siaddr)
-        packet[20:24] = socket.inet_aton(self.server_ip)
-
-        # Gateway IP (giaddr)
-        packet[24:28] = b'\x00' * 4
-
-        # Client MAC address
-        packet[28:34] = client_mac
-        packet[34:44] = b'\x00' * 10  # Padding
-
-        # Server hostname (sname field) - 64 bytes at offset 44
-        # Leave empty, using siaddr instead
-        packet[44:108] = b'\x00' * 64
-
-        # Boot filename (file field) - 128 bytes at offset 108
-        # This is critical for PXE - put the boot filename here
-        boot_filename_bytes = bootfile.encode('ascii') + b'\x00'
-        packet[108:108+len(boot_filename_bytes)] = boot_filename_bytes
-        packet[108+len(boot_filename_bytes):236] = b'\x00' * (128 - len(boot_filename_bytes))
-
-        # Magic cookie
-        packet[236:240] = bytes([99, 130, 83, 99])
-
-        # DHCP options
-        options = bytearray()
-
-        # Option 53: DHCP Message Type
-        options.extend([53, 1, msg_type])
-
-        # Option 54: DHCP Server Identifier
-        options.extend([54, 4] + list(socket.inet_aton(self.server_ip)))
-
-        # Option 51: IP Address Lease Time (1 hour)
-        options.extend([51, 4, 0, 0, 14, 16])
-
-        # Option 1: Subnet Mask
-        options.extend([1, 4] + list(socket.inet_aton(self.netmask)))
-
-        # Option 3: Router
-        options.extend([3, 4] + list(socket.inet_aton(self.server_ip)))
-
-        # Option 6: DNS Server
-        options.extend([6, 4] + list(socket.inet_aton(self.server_ip)))
-
+        bootfile = BOOTFILE_BY_ARCH.get(arch_code)
+        if bootfile is None:
+            logger.warning("  → Unknown architecture 0x%04x - defaulting to BIOS", arch_code)
+            bootfile = "lpxelinux.0"
+        return bootfile
+
+    def _build_reply_template(self):
+        """Build the parts of a DHCP reply that stay the same for every client"""
+        # BOOTP header: Boot Reply, Ethernet, 6 byte hardware address, 0 hops, then siaddr and
+        # the magic cookie. Transaction ID (4:8), yiaddr (16:20), client MAC (28:34) and the
+        # boot filename (file field, 128 bytes at 108) are filled in per reply. Seconds elapsed,
+        # flags (don't force broadcast for UEFI, let client decide), ciaddr, giaddr and the
+        # server hostname (sname, using siaddr instead) all stay zero.
+        header = DHCP_REPLY_HEADER.pack(2, 1, 6, 0, 0, 0, self._server_ip_packed, DHCP_MAGIC_COOKIE)
+
+        # DHCP options 53 (message type, patched per reply at DHCP_MSG_TYPE_OFFSET),
+        # 54 (server identifier), 51 (lease time, 1 hour), 1 (subnet mask), 3 (router)
+        # and 6 (DNS server), then 43 (vendor-specific PXE information).
+        #
         # Don't send Option 60 - that's for clients to identify themselves
         # Server responding with it confuses some clients
-
-        # Option 43: Vendor-Specific Information (PXE)
-        # For UEFI, this should be minimal or match what client expects
+        #
+        # Option 43: For UEFI, this should be minimal or match what client expects
         # PXE Discovery Control: bits mean different things
         # Bit 0: disable broadcast discovery
         # Bit 1: disable multicast discovery
         # Bit 2: only accept servers in boot server list
         # Bit 3: download boot file from server
         # 0x0A = bits 1 and 3 set
-        pxe_vendor_options = bytearray([6, 1, 0x0A])
-        options.extend([43, len(pxe_vendor_options)] + list(pxe_vendor_options))
+        options = DHCP_FIXED_OPTIONS.pack(
+            53, 1, 0,
+            54, 4, self._server_ip_packed,
+            51, 4, (3600).to_bytes(4, 'big'),
+            1, 4, self._netmask_packed,
+            3, 4, self._server_ip_packed,
+            6, 4, self._server_ip_packed,
+            43, 3, bytes([6, 1, 0x0A]),
+        )
 
         # Option 66: TFTP Server Name (use IP as string for compatibility)
-        tftp_server = self.server_ip.encode('ascii')
-        options.extend([66, len(tftp_server)] + list(tftp_server))
+        tftp_server = self._server_ip_ascii
+        options += _dhcp_string_option(len(tftp_server)).pack(66, len(tftp_server), tftp_server)
+
+        # Option 67 (bootfile) and the end option are appended per bootfile, see _bootfile_template
 
-        # Option 67: Bootfile Name (also in BOOTP field above, but include for compatibility)
-        bootfile_bytes = bootfile.encode('ascii')
-        options.extend([67, len(bootfile_bytes)] + list(bootfile_bytes))
+        return header + options
 
-        # End option
-        options.append(255)
+    def _bootfile_template(self, bootfile):
+        """Complete reply template for one bootfile, cached since there are only a handful of them"""
+        template = self._bootfile_templates.get(bootfile)
+        if template is None:
+            bootfile_bytes = bootfile.encode('ascii')
+            packet = bytearray(self._reply_template)
 
-        packet[240:240+len(options)] = options
+            # Boot filename in the BOOTP file field, the template already zero-pads the rest
+            packet[108:108+len(bootfile_bytes)] = bootfile_bytes
 
-        return bytes(packet[:240+len(options)])
+            # Option 67: Bootfile Name (also in BOOTP field above, but include for compatibility)
+            packet += _dhcp_string_option(len(bootfile_bytes)).pack(67, len(bootfile_bytes), bootfile_bytes)
+
+            # End option
+            packet.append(255)
+
+            template = self._bootfile_templates[bootfile] = bytes(packet)
+        return template
+
+    def _pack_ip(self, ip):
+        """Packed 4-byte form of an integer address, cached per pool address"""
+        packed = self._packed_ips.get(ip)
+        if packed is None:
+            packed = struct.pack("!I", ip)
+            # ProxyDHCP clients bring their own address, caching those would grow without bound
+            if ip in self._pool:
+                self._packed_ips[ip] = packed
+        return packed
+
+    def _build_dhcp_packet(self, transaction_id, client_mac, client_ip, msg_type, bootfile='lpxelinux.0'):
+        """Build a DHCP packet by patching the per-client fields into the bootfile's reply template"""
+        # This is one template copy plus four slice writes, all of which run in C already;
+        # a Cython codec would only save the call overhead and would cost us the single-file uv script.
+        cached = self._client_packets.get(client_mac)
+        if cached is None or cached[0] != bootfile:
+            # First reply to this client (or it switched bootloader), MAC only needs writing once
+            packet = bytearray(self._bootfile_template(bootfile))
+            packet[28:34] = client_mac
+            if client_mac in self._leases:
+                self._client_packets[client_mac] = (bootfile, packet)
+        else:
+            packet = cached[1]
+
+        packet[4:8] = transaction_id
+        packet[16:20] = self._pack_ip(client_ip)
+        packet[self.DHCP_MSG_TYPE_OFFSET] = msg_type
+
+        # Returned as-is and patched again on the next reply, UDPBatch.queue() and
+        # sendto() both copy it out before that can happen
+        return packet
 
     def _parse_dhcp_packet(self, data):
         """Parse incoming DHCP packet"""
         if len(data) < 240:
             return None
 
+        # Usually already a view into the UDPBatch receive buffer, only the fields kept are copied out
+        mv = memoryview(data)
+
         # Check magic cookie
-        if data[236:240] != bytes([99, 130, 83, 99]):
+        if mv[236:240] != DHCP_MAGIC_COOKIE:
             return None
 
-        transaction_id = data[4:8]
-        client_mac = data[28:34]
-
         # Parse options to find message type and vendor class
-        msg_type = None
-        vendor_class = None
-        requested_ip = None
-        client_arch = None  # Option 93 - Client System Architecture
+        result = {
+            'transaction_id': bytes(mv[4:8]),
+            'client_mac': bytes(mv[28:34]),
+            'msg_type': None,
+            'vendor_class': None,
+            'requested_ip': None,  # Raw 4 bytes, only converted to a string if someone needs it
+            'client_arch': None,  # Option 93 - Client System Architecture
+        }
+        handlers = DHCP_OPTION_HANDLERS
 
         i = 240
-        while i < len(data):
-            option = data[i]
+        end = len(mv)
+        while i < end:
+            option = mv[i]
             if option == 255:  # End option
                 break
             if option == 0:  # Pad option
                 i += 1
                 continue
+            if i + 1 >= end:
+                break
 
-            option_len = data[i + 1]
-            if option == 53:  # DHCP Message Type
-                msg_type = data[i + 2]
-            elif option == 60:  # Vendor Class Identifier
-                vendor_class = data[i + 2:i + 2 + option_len]
-            elif option == 50:  # Requested IP Address
-                requested_ip = socket.inet_ntoa(data[i + 2:i + 6])
-            elif option == 93:  # Client System Architecture
-                # This is a 2-byte value
-                if option_len >= 2:
-                    client_arch = (data[i + 2] << 8) | data[i + 3]
+            option, option_len = DHCP_OPTION_HEADER.unpack_from(mv, i)
+            if i + 2 + option_len > end:
+                break
+
+            handler = handlers.get(option)
+            if handler:
+                handler(result, mv, i + 2, option_len)
+                # Everything the server acts on has been seen, skip the rest of the options
+                if (result['msg_type'] is not None and result['vendor_class'] is not None
+                        and result['client_arch'] is not None):
+                    break
 
             i += 2 + option_len
 
-        return {
-            'transaction_id': transaction_id,
-            'client_mac': client_mac,
-            'msg_type': msg_type,
-            'vendor_class': vendor_class,
-            'requested_ip': requested_ip,
-            'client_arch': client_arch
-        }
+        return result
+
+    def _handle_packet(self, data, addr):
+        """Handle one DHCP request, returns the reply to broadcast or None"""
+        parsed = self._parse_dhcp_packet(data)
+
+        if not parsed:
+            return None
+
+        client_mac = parsed['client_mac']
+        mac_str = client_mac.hex(':')
+
+        if parsed['msg_type'] == self.DHCPDISCOVER:
+            vendor_class_bytes = parsed.get('vendor_class')
+            vendor = vendor_class_bytes.decode('ascii', errors='ignore') if vendor_class_bytes else ''
+            client_arch = parsed.get('client_arch')
+
+            # Check if this is a PXE client
+            is_pxe = vendor and 'PXEClient' in vendor
+
+            if is_pxe:
+                # Determine bootloader based on architecture
+                bootfile = self._get_bootfile_for_arch(client_arch)
+            else:
+                bootfile = None  # No bootfile for regular DHCP
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("DHCP DISCOVER from %s", mac_str)
+                if vendor:
+                    logger.info("  Vendor Class: %s", vendor)
+                if is_pxe:
+                    logger.info("  → PXE boot request")
+                    if client_arch is not None:
+                        logger.info("  Client Architecture: %s (%s)", client_arch, self._get_arch_name(client_arch))
+                    logger.info("  Selected bootloader: %s", bootfile)
+                else:
+                    logger.info("  → Regular DHCP request (likely initramfs network setup)")
+
+            # Check if client already has an IP (ProxyDHCP mode)
+            client_has_ip = data[12:16] != b'\x00\x00\x00\x00'  # ciaddr field
+
+            if client_has_ip:
+                # ProxyDHCP mode - client wants boot info only, not IP
+                client_ip = int.from_bytes(data[12:16], 'big')
+                logger.info("  ProxyDHCP mode detected - client already has IP %s", socket.inet_ntoa(data[12:16]))
+            else:
+                # Normal DHCP - allocate new IP
+                logger.debug("  Client address: %s", addr)
+                client_ip = self._allocate_ip(client_mac)
+
+            response = self._build_dhcp_packet(
+                parsed['transaction_id'],
+                client_mac,
+                client_ip,
+                self.DHCPOFFER,
+                bootfile or ''  # Empty string for non-PXE DHCP
+            )
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("DHCP OFFER queued for %s: %s (%d bytes)", mac_str, self._int_to_ip(client_ip), len(response))
+                if bootfile:
+                    logger.info("  Next server: %s", self.server_ip)
+                    logger.info("  Boot file: %s", bootfile)
+                else:
+                    logger.info("  (No boot file - regular DHCP)")
+            return response
+
+        elif parsed['msg_type'] == self.DHCPREQUEST:
+            vendor_class_bytes = parsed.get('vendor_class')
+            vendor = vendor_class_bytes.decode('ascii', errors='ignore') if vendor_class_bytes else ''
+            is_pxe = vendor and 'PXEClient' in vendor
+
+            client_ip = self._allocate_ip(client_mac)
+
+            # Get architecture for bootfile (only for PXE)
+            if is_pxe:
+                client_arch = parsed.get('client_arch')
+                bootfile = self._get_bootfile_for_arch(client_arch)
+            else:
+                bootfile = ''
+
+            response = self._build_dhcp_packet(
+                parsed['transaction_id'],
+                client_mac,
+                client_ip,
+                self.DHCPACK,
+                bootfile
+            )
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("DHCP REQUEST from %s", mac_str)
+                logger.info("  → %s", "PXE boot ACK" if is_pxe else "Regular DHCP ACK")
+                logger.info("DHCP ACK queued for %s: %s (%d bytes)", mac_str, self._int_to_ip(client_ip), len(response))
+            return response
+
+        return None
 
     def start(self):
-        """Start the DHCP server"""
+        """Open the DHCP socket, returns False if it could not be bound"""
         self.running = True
+
+        # Deliberately a single socket in a single process. SO_REUSEPORT sharding does not help
+        # DHCP: every DISCOVER/REQUEST travels 0.0.0.0:68 -> 255.255.255.255:67, so the kernel's
+        # reuseport hash would put a whole boot storm on one worker, while unicast renewals
+        # would land on others that never saw the lease.
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 
+        # A boot storm that overflows the default ~208KB queue is dropped silently,
+        # and every client that lost its DISCOVER backs off for seconds before retrying
+        for opt, sysctl in ((socket.SO_RCVBUF, "rmem_max"), (socket.SO_SNDBUF, "wmem_max")):
+            self.sock.setsockopt(socket.SOL_SOCKET, opt, DHCP_SOCKET_BUF_SIZE)
+            # Linux reports double the usable size it granted
+            granted = self.sock.getsockopt(socket.SOL_SOCKET, opt) // 2
+            if granted < DHCP_SOCKET_BUF_SIZE:
+                logger.warning(f"DHCP socket buffer limited to {granted} bytes, raise net.core.{sysctl} for more")
+
         # Bind to specific interface to ensure we send/receive on correct network
-        import struct
         self.sock.setsockopt(
             socket.SOL_SOCKET,
             25,  # SO_BINDTODEVICE
@@ -306,136 +764,493 @@ class DHCPServer:
             self.sock.bind(('0.0.0.0', self.DHCP_SERVER_PORT))
         except PermissionError:
             logger.error("Permission denied binding to port 67. Run as root!")
-            return
+            return False
+
+        # Let the kernel throw away anything that is not a DHCP request (relayed BOOTREPLYs,
+        # junk on port 67) before it is queued and the event loop is woken up for it
+        try:
+            attach_socket_filter(self.sock, DHCP_REQUEST_FILTER)
+        except OSError as e:
+            logger.warning(f"Could not attach DHCP socket filter, filtering in Python only: {e}")
+
+        # Drain every queued request with one recvmmsg and answer them with one sendmmsg,
+        # rather than paying a recvfrom + sendto pair per client during a boot storm.
+        # MSG_ZEROCOPY is deliberately not used: replies are ~300 bytes, well under the ~10KB where
+        # page pinning plus draining completions from MSG_ERRQUEUE costs less than the memcpy it saves.
+        self.sock.setblocking(False)
+        self.batch = UDPBatch(self.sock)
 
         logger.info(f"DHCP server started on port {self.DHCP_SERVER_PORT}")
         logger.info(f"Bound to interface: {self.interface}")
-
+        return True
+
+    def handle_readable(self):
+        """Answer every queued request, called by the event loop when the socket is readable"""
+        # A short batch means the socket was drained, so go straight back to the event loop
+        # instead of paying for a recvmmsg that can only return EAGAIN. Each burst then
+        # costs one wake-up, one recvmmsg and one sendmmsg - the same shape an io_uring
+        # multishot recv would give us, without a liburing binding we cannot ship via uv.
+        batch = self.batch
         while self.running:
             try:
-                data, addr = self.sock.recvfrom(1024)
-                parsed = self._parse_dhcp_packet(data)
+                count = batch.recv()
+
+                for i in range(count):
+                    data, addr = batch.packet(i)
+                    try:
+                        response = self._handle_packet(data, addr)
+                    except Exception as e:
+                        logger.error("DHCP error: %s", e)
+                        continue
+                    if response:
+                        batch.queue(response, ('<broadcast>', self.DHCP_CLIENT_PORT))
 
-                if not parsed:
+                try:
+                    batch.flush()
+                except Exception as send_error:
+                    logger.error("Failed to send DHCP replies: %s", send_error)
+                    traceback.print_exc()
+
+            except Exception as e:
+                if self.running:
+                    logger.error("DHCP error: %s", e)
+                return
+
+            if count < batch.size:
+                return
+
+    def stop(self):
+        """Stop the DHCP server"""
+        self.running = False
+        if self.sock:
+            self.sock.close()
+
+
+class TFTPTransfer:
+    """One read request being served from its own ephemeral port (the TFTP transfer ID)"""
+
+    def __init__(self, server, sock, addr, filename, view, blksize, timeout, windowsize):
+        self.server = server
+        self.sock = sock
+        self.addr = addr
+        self.filename = filename
+        self.view = view
+        self.blksize = blksize
+        self.timeout = timeout
+        self.windowsize = windowsize
+        # The final block is the first one shorter than blksize, possibly empty
+        self.last_block = len(view) // blksize + 1
+        # Unwrapped block numbers, only the low 16 bits go on the wire
+        self.acked = 0
+        self.sent = 0
+        self.oack_pending = False
+        self.pending = []
+        self.retries = 0
+        self.deadline = 0.0
+
+    def send_oack(self, packet):
+        """Send the option acknowledgement, the client answers it with ACK 0"""
+        self.oack_pending = True
+        self.pending = [[packet]]
+        self.retries = 0
+        self._transmit()
+
+    def send_window(self):
+        """Send the next window of data blocks after the last acknowledged one"""
+        self.pending = []
+        last = min(self.acked + self.windowsize, self.last_block)
+        for block in range(self.acked + 1, last + 1):
+            offset = (block - 1) * self.blksize
+            self.pending.append([TFTP_HEADER.pack(TFTP_DATA, block & 0xFFFF), self.view[offset:offset + self.blksize]])
+        self.sent = last
+        self.retries = 0
+        self._transmit()
+
+    def _transmit(self):
+        self.deadline = time.monotonic() + self.timeout
+        try:
+            # Scatter-gather straight out of the mmap, the block is never copied into a Python bytes
+            for parts in self.pending:
+                self.sock.sendmsg(parts)
+        except BlockingIOError:
+            pass  # Treated like a lost packet, the retransmit timer will try again
+        except OSError as e:
+            logger.warning("TFTP transfer of %s to %s failed: %s", self.filename, self.addr[0], e)
+            self.server.finish(self)
+
+    def handle_readable(self):
+        """Process ACKs from the client, called by the event loop"""
+        while True:
+            try:
+                data = self.sock.recv(UDP_BATCH_BUF_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.warning("TFTP transfer of %s to %s failed: %s", self.filename, self.addr[0], e)
+                self.server.finish(self)
+                return
+
+            if len(data) < 4:
+                continue
+            opcode, block = TFTP_HEADER.unpack_from(data)
+
+            if opcode == TFTP_ERROR:
+                # Clients routinely abort after reading tsize from the OACK, so this is not worth a warning
+                logger.debug("TFTP client %s aborted %s: %s", self.addr[0], self.filename, data[4:-1])
+                self.server.finish(self)
+                return
+            if opcode != TFTP_ACK:
+                continue
+
+            if self.oack_pending:
+                if block != 0:
                     continue
+                self.oack_pending = False
+                self.send_window()
+                continue
 
-                client_mac = parsed['client_mac']
-                mac_str = ':'.join(f'{b:02x}' for b in client_mac)
+            # How far into the outstanding window this ACK reaches. Duplicate ACKs for older
+            # blocks are ignored, resending on them would double every packet. An ACK short
+            # of the window's end means the client lost a block, so resume right after it.
+            advance = (block - self.acked) & 0xFFFF
+            if advance == 0 or advance > self.sent - self.acked:
+                continue
+            self.acked += advance
 
-                if parsed['msg_type'] == self.DHCPDISCOVER:
-                    vendor_class_bytes = parsed.get('vendor_class')
-                    vendor = vendor_class_bytes.decode('ascii', errors='ignore') if vendor_class_bytes else ''
-                    client_arch = parsed.get('client_arch')
+            if self.acked == self.last_block:
+                logger.info("TFTP sent %s to %s (%d bytes)", self.filename, self.addr[0], len(self.view))
+                self.server.finish(self)
+                return
 
-                    logger.info(f"DHCP DISCOVER from {mac_str}")
-                    if vendor:
-                        logger.info(f"  Vendor Class: {vendor}")
+            self.send_window()
 
-                    # Check if this is a PXE client
-                    is_pxe = vendor and 'PXEClient' in vendor
+    def check_timeout(self, now):
+        """Retransmit the pending packets if their ACK is overdue"""
+        if now < self.deadline:
+            return
+        self.retries += 1
+        if self.retries > TFTP_RETRIES:
+            logger.warning("TFTP transfer of %s to %s timed out at block %d", self.filename, self.addr[0], self.acked + 1)
+            self.server.finish(self)
+            return
+        self._transmit()
 
-                    if is_pxe:
-                        logger.info(f"  → PXE boot request")
-                        if client_arch is not None:
-                            logger.info(f"  Client Architecture: {client_arch} ({self._get_arch_name(client_arch)})")
 
-                        # Determine bootloader based on architecture
-                        bootfile = self._get_bootfile_for_arch(client_arch)
-                        logger.info(f"  Selected bootloader: {bootfile}")
-                    else:
-                        logger.info(f"  → Regular DHCP request (likely initramfs network setup)")
-                        bootfile = None  # No bootfile for regular DHCP
+class TFTPServer:
+    """Read-only TFTP server (RFC 1350 + blksize/tsize/timeout/windowsize options) driven by the PXE event loop"""
 
-                    # Check if client already has an IP (ProxyDHCP mode)
-                    client_has_ip = data[12:16] != b'\x00\x00\x00\x00'  # ciaddr field
+    def __init__(self, root, server_ip, selector):
+        self.root = os.path.realpath(root)
+        self.server_ip = server_ip
+        self.selector = selector
+        self.sock = None
+        self.transfers = set()
+        # realpath -> (mtime_ns, size, memoryview of a read-only mmap). Every client booting at
+        # the same time reads the kernel and initrd through one page-cache-backed mapping.
+        self._files = {}
 
-                    if client_has_ip:
-                        # ProxyDHCP mode - client wants boot info only, not IP
-                        logger.info(f"  ProxyDHCP mode detected - client already has IP")
-                        client_ip = socket.inet_ntoa(data[12:16])
-                        logger.info(f"  Client IP: {client_ip}")
-                    else:
-                        # Normal DHCP - allocate new IP
-                        logger.debug(f"  Client address: {addr}")
-                        client_ip = self._allocate_ip(client_mac)
-
-                    response = self._build_dhcp_packet(
-                        parsed['transaction_id'],
-                        client_mac,
-                        client_ip,
-                        self.DHCPOFFER,
-                        bootfile or ''  # Empty string for non-PXE DHCP
-                    )
+    def start(self):
+        """Bind the well-known port and register it with the event loop"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.server_ip, TFTP_PORT))
+        self.sock.setblocking(False)
+        self.selector.register(self.sock, selectors.EVENT_READ, self.handle_readable)
+
+    def _open(self, path):
+        """Return a memoryview of the file, mapping it on first use or when it has changed"""
+        st = os.stat(path)
+        cached = self._files.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        if st.st_size == 0:
+            view = memoryview(b'')  # mmap refuses empty files
+        else:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+            # Every block is going to be sent, so start reading the whole file in now
+            mm.madvise(mmap.MADV_WILLNEED)
+            view = memoryview(mm)
+        # A replaced mapping stays alive until the transfers still reading it finish
+        self._files[path] = (st.st_mtime_ns, st.st_size, view)
+        return view
+
+    def preload(self, filenames):
+        """Map files ahead of the first request so no client waits on the disk"""
+        for filename in filenames:
+            try:
+                self._open(os.path.realpath(os.path.join(self.root, filename)))
+            except OSError as e:
+                logger.warning(f"Could not preload {filename} for TFTP: {e}")
 
-                    try:
-                        bytes_sent = self.sock.sendto(response, ('<broadcast>', self.DHCP_CLIENT_PORT))
-                        logger.info(f"DHCP OFFER sent to {mac_str}: {client_ip} ({bytes_sent} bytes)")
-                        if bootfile:
-                            logger.info(f"  Next server: {self.server_ip}")
-                            logger.info(f"  Boot file: {bootfile}")
-                        else:
-                            logger.info(f"  (No boot file - regular DHCP)")
-                    except Exception as send_error:
-                        logger.error(f"Failed to send DHCP OFFER: {send_error}")
-                        import traceback
-                        traceback.print_exc()
-
-                elif parsed['msg_type'] == self.DHCPREQUEST:
-                    vendor_class_bytes = parsed.get('vendor_class')
-                    vendor = vendor_class_bytes.decode('ascii', errors='ignore') if vendor_class_bytes else ''
-                    is_pxe = vendor and 'PXEClient' in vendor
-
-                    logger.info(f"DHCP REQUEST from {mac_str}")
-                    client_ip = self._allocate_ip(client_mac)
-
-                    # Get architecture for bootfile (only for PXE)
-                    if is_pxe:
-                        client_arch = parsed.get('client_arch')
-                        bootfile = self._get_bootfile_for_arch(client_arch)
-                        logger.info(f"  → PXE boot ACK")
-                    else:
-                        bootfile = ''
-                        logger.info(f"  → Regular DHCP ACK")
-
-                    response = self._build_dhcp_packet(
-                        parsed['transaction_id'],
-                        client_mac,
-                        client_ip,
-                        self.DHCPACK,
-                        bootfile
-                    )
+    def _send_error(self, sock, addr, code, message):
+        try:
+            sock.sendto(TFTP_HEADER.pack(TFTP_ERROR, code) + message.encode() + b'\0', addr)
+        except OSError:
+            pass
 
-                    try:
-                        bytes_sent = self.sock.sendto(response, ('<broadcast>', self.DHCP_CLIENT_PORT))
-                        logger.info(f"DHCP ACK sent to {mac_str}: {client_ip} ({bytes_sent} bytes)")
-                    except Exception as send_error:
-                        logger.error(f"Failed to send DHCP ACK: {send_error}")
+    def handle_readable(self):
+        """Start a transfer for every queued read request, called by the event loop"""
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(UDP_BATCH_BUF_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.error("TFTP error: %s", e)
+                return
 
+            try:
+                self._handle_request(data, addr)
             except Exception as e:
-                if self.running:
-                    logger.error(f"DHCP error: {e}")
+                logger.error("TFTP error handling request from %s: %s", addr[0], e)
+
+    def _handle_request(self, data, addr):
+        if len(data) < 4:
+            return
+        opcode = TFTP_HEADER.unpack_from(data)[0]
+        if opcode != TFTP_RRQ:
+            self._send_error(self.sock, addr, TFTP_ERR_ILLEGAL_OP, "Only read requests are supported")
+            return
+
+        # filename \0 mode \0 [option \0 value \0]...
+        fields = data[2:].split(b'\0')
+        if len(fields) < 3:
+            self._send_error(self.sock, addr, TFTP_ERR_ILLEGAL_OP, "Malformed read request")
+            return
+        filename = fields[0].decode(errors='replace')
+        options = fields[2:-1]
+        options = {k.decode(errors='replace').lower(): v for k, v in zip(options[0::2], options[1::2])}
+
+        path = os.path.realpath(os.path.join(self.root, filename.lstrip('/')))
+        if not path.startswith(self.root + os.sep):
+            logger.warning("TFTP %s requested a path outside the root: %s", addr[0], filename)
+            self._send_error(self.sock, addr, TFTP_ERR_ACCESS, "Access violation")
+            return
+        try:
+            view = self._open(path)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            logger.info("TFTP %s requested missing file: %s", addr[0], filename)
+            self._send_error(self.sock, addr, TFTP_ERR_NOT_FOUND, "File not found")
+            return
+
+        # Negotiate the options we understand and acknowledge only those
+        blksize = TFTP_BLOCK_SIZE
+        timeout = TFTP_TIMEOUT
+        windowsize = 1
+        oack = []
+        try:
+            if 'blksize' in options:
+                blksize = min(max(int(options['blksize']), 8), 65464)
+                oack.append((b'blksize', str(blksize).encode()))
+            if 'timeout' in options:
+                timeout = min(max(int(options['timeout']), 1), 255)
+                oack.append((b'timeout', str(timeout).encode()))
+            if 'tsize' in options:
+                oack.append((b'tsize', str(len(view)).encode()))
+            if 'windowsize' in options:
+                # RFC 7440: several blocks per ACK, so a transfer costs one loop wake-up
+                # per window rather than one per block
+                windowsize = min(max(int(options['windowsize']), 1), TFTP_MAX_WINDOW)
+                oack.append((b'windowsize', str(windowsize).encode()))
+        except ValueError:
+            self._send_error(self.sock, addr, TFTP_ERR_OPTION, "Bad option value")
+            return
+
+        logger.info("TFTP %s requested %s", addr[0], filename)
+
+        # Each transfer gets its own connected socket, so the kernel only hands us that client's ACKs
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Room for a whole window of large blocks, so sending one never hits EAGAIN halfway through.
+        # The kernel clamps this to net.core.wmem_max.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, TFTP_SOCKET_BUF_SIZE)
+        sock.bind((self.server_ip, 0))
+        sock.connect(addr)
+        sock.setblocking(False)
+
+        transfer = TFTPTransfer(self, sock, addr, filename, view, blksize, timeout, windowsize)
+        self.transfers.add(transfer)
+        self.selector.register(sock, selectors.EVENT_READ, transfer.handle_readable)
+
+        if oack:
+            # The client ACKs block 0 to accept the options, then data starts at block 1
+            transfer.send_oack(TFTP_OPCODE.pack(TFTP_OACK) + b''.join(k + b'\0' + v + b'\0' for k, v in oack))
+        else:
+            transfer.send_window()
+
+    def finish(self, transfer):
+        """Unregister and close a completed or abandoned transfer"""
+        if transfer not in self.transfers:
+            return
+        self.transfers.discard(transfer)
+        try:
+            self.selector.unregister(transfer.sock)
+        except (KeyError, ValueError):
+            pass
+        transfer.sock.close()
+
+    def next_timeout(self):
+        """Seconds until the earliest retransmit is due, or None when nothing is in flight"""
+        if not self.transfers:
+            return None
+        return max(0.0, min(t.deadline for t in self.transfers) - time.monotonic())
+
+    def check_timeouts(self):
+        """Retransmit every packet whose ACK is overdue"""
+        now = time.monotonic()
+        for transfer in list(self.transfers):
+            transfer.check_timeout(now)
 
     def stop(self):
-        """Stop the DHCP server"""
-        self.running = False
+        """Close the listening socket and every active transfer"""
+        for transfer in list(self.transfers):
+            self.finish(transfer)
         if self.sock:
             self.sock.close()
 
 
+# umount2(2) directly, so unmounting the image costs a syscall rather than an umount(8) fork
+MNT_DETACH = 2
+
+try:
+    _umount2 = ctypes.CDLL("libc.so.6", use_errno=True).umount2
+    _umount2.argtypes = [ctypes.c_char_p, ctypes.c_int]
+except (OSError, AttributeError):
+    _umount2 = None
+
+
+def umount(path, flags=0):
+    """Unmount a filesystem, raises OSError on failure"""
+    if _umount2 is None:
+        result = subprocess.run(['umount'] + (['-l'] if flags & MNT_DETACH else []) + [str(path)], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise OSError(f"umount {path}: {result.stderr.strip()}")
+        return
+    if _umount2(os.fsencode(str(path)), flags) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), str(path))
+
+
+def copy_file(src, dst):
+    """Copy a file with copy_file_range(2), which reflinks on btrfs/XFS and stays in the kernel elsewhere"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            return
+        except OSError:
+            # EXDEV across some filesystem pairs, ENOSYS/EOPNOTSUPP on older kernels - start over the slow way
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst)
+
+
+def copy_files(pairs):
+    """Copy (src, dst) pairs concurrently, the copies release the GIL so their I/O overlaps"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        # Consume the results so the first failed copy raises here
+        for _ in pool.map(lambda pair: copy_file(*pair), pairs):
+            pass
+
+
+def write_if_changed(path, data):
+    """Write bytes to a file unless it already holds exactly them, returns True if it was written"""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+    return True
+
+
+def parse_cpulist(cpulist):
+    """Parse a sysfs CPU list such as '0-3,8-11' into a set of CPU numbers"""
+    cpus = set()
+    for part in cpulist.strip().split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def list_dir_names(path):
+    """Entry names in a directory, or an empty list if it does not exist"""
+    try:
+        with os.scandir(path) as it:
+            return [entry.name for entry in it]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def wait_for_partitions(device, timeout=10):
+    """Wait for the kernel's partition scan of a block device and udev's device nodes, returns the partition device paths"""
+    name = os.path.basename(device)
+    prefix = name + 'p'
+    deadline = time.monotonic() + timeout
+    previous = None
+    while True:
+        # Partitions show up as nbd15p1, nbd15p2, ... under the disk's sysfs directory, one at a time
+        # as the scan finds them, and udev creates their /dev nodes some time after that. Done once
+        # two listings in a row agree and every node exists.
+        parts = sorted((n for n in list_dir_names(f"/sys/class/block/{name}") if n.startswith(prefix)),
+                       key=lambda n: int(n[len(prefix):]))
+        paths = [f"/dev/{n}" for n in parts]
+        if parts and parts == previous and all(os.path.exists(p) for p in paths):
+            return paths
+        if time.monotonic() >= deadline:
+            return paths
+        previous = parts
+        time.sleep(0.05)
+
+
+@functools.lru_cache(maxsize=1)
+def syslinux_index():
+    """Map each required syslinux file to the highest priority directory holding it, one listing per directory"""
+    required = set(SYSLINUX_FILES)
+    index = {}
+    for search_path in SYSLINUX_PATHS:
+        for name in required.intersection(list_dir_names(search_path)):
+            index.setdefault(name, search_path)
+        if len(index) == len(required):
+            break
+    return index
+
+
 class PXEBootServer:
     """Main PXE Boot Server with NBD support"""
 
-    def __init__(self, interface, qcow2_path):
+    def __init__(self, interface, qcow2_path, convert_raw=False):
         self.interface = interface
         self.qcow2_path = Path(qcow2_path)
         self.server_ip = SERVER_IP
 
+        # Image exported over NBD, replaced by a raw copy when convert_raw is set
+        self.convert_raw = convert_raw
+        self.nbd_image = self.qcow2_path
+        self.nbd_image_format = 'qcow2'
+
         # Process handles
         self.nbd_process = None
+        self.nbd_pidfd = None
+        self.nbd_started_at = None
+        self.nbd_restart_delay = NBD_RESTART_DELAY
+        self.nbd_restart_at = None  # time.monotonic() deadline while a restart is pending
         self.dhcp_server = None
         self.tftp_server = None
+        self.tftp_process = None
+        self.tftp_pidfd = None
         self.http_server = None
-        self.http_thread = None
+
+        # DHCP, TFTP and HTTP are served from one selector loop on the main thread
+        self.selector = selectors.DefaultSelector()
 
         # Verify qcow2 file exists
         if not self.qcow2_path.exists():
@@ -462,6 +1277,23 @@ class PXEBootServer:
 
         logger.info(f"Network configured: {self.server_ip}/24 on {self.interface}")
 
+    def pin_to_interface_numa_node(self):
+        """Restrict the server (and the NBD server, which inherits it) to CPUs local to the NIC"""
+        # On multi-socket hosts this keeps packet processing on the node the NIC DMAs into,
+        # instead of letting the scheduler bounce the event loop across sockets
+        try:
+            node = int(Path(f"/sys/class/net/{self.interface}/device/numa_node").read_text())
+            if node < 0:
+                return  # Single node machine, or the NIC has no affinity
+            cpus = parse_cpulist(Path(f"/sys/devices/system/node/node{node}/cpulist").read_text())
+        except (OSError, ValueError):
+            return  # Virtual interface, or no NUMA information
+
+        cpus &= os.sched_getaffinity(0)
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+            logger.info(f"Pinned to NUMA node {node} CPUs local to {self.interface}: {sorted(cpus)}")
+
     def setup_directories(self):
         """Create necessary directories"""
         for directory in [WORK_DIR, TFTP_ROOT, HTTP_ROOT]:
@@ -476,39 +1308,26 @@ class PXEBootServer:
         """Copy PXE bootloader files to TFTP root"""
         logger.info("Setting up bootloader files")
 
-        # Common locations for syslinux files (ordered by priority)
-        syslinux_paths = [
-            '/usr/lib/syslinux/bios',           # Arch Linux, modern systems
-            '/usr/lib/syslinux/modules/bios',   # Debian/Ubuntu
-            '/usr/lib/syslinux',                # Older systems
-            '/usr/share/syslinux',              # Fedora/RHEL
-            '/usr/lib/PXELINUX',                # Some Debian variants
-        ]
-
-        # Required files for BIOS PXE boot
-        required_files = ['lpxelinux.0', 'ldlinux.c32', 'menu.c32', 'libutil.c32']
-
         missing_files = []
+        copies = []
+        index = syslinux_index()
 
-        for filename in required_files:
+        for filename in SYSLINUX_FILES:
             dest = Path(f"{TFTP_ROOT}/{filename}")
             if dest.exists():
                 logger.info(f"File already exists: {filename}")
                 continue
 
-            # Search for file in known locations
-            found = False
-            for search_path in syslinux_paths:
-                source = Path(search_path) / filename
-                if source.exists():
-                    subprocess.run(['cp', str(source), str(dest)], check=True)
-                    logger.info(f"Copied {filename} from {search_path}")
-                    found = True
-                    break
-
-            if not found:
+            search_path = index.get(filename)
+            if search_path:
+                copies.append((Path(search_path) / filename, dest))
+            else:
                 missing_files.append(filename)
 
+        copy_files(copies)
+        for source, _ in copies:
+            logger.info(f"Copied {source.name} from {source.parent}")
+
         # Report any missing files
         if missing_files:
             logger.error("=" * 60)
@@ -517,7 +1336,7 @@ class PXEBootServer:
             logger.error(f"Could not find: {', '.join(missing_files)}")
             logger.error("")
             logger.error("Searched locations:")
-            for path in syslinux_paths:
+            for path in SYSLINUX_PATHS:
                 logger.error(f"  - {path}")
             logger.error("")
             logger.error("Install syslinux package for your distribution:")
@@ -558,7 +1377,7 @@ class PXEBootServer:
         for grub_path in grub_paths:
             source = Path(grub_path)
             if source.exists():
-                subprocess.run(['cp', str(source), str(dest)], check=True)
+                shutil.copyfile(source, dest)
                 logger.info(f"✓ Copied GRUB EFI from {grub_path}")
                 return
 
@@ -581,7 +1400,7 @@ class PXEBootServer:
     def _build_grub_efi(self, output_path):
         """Build grubx64.efi from GRUB modules using grub-mkstandalone"""
         # Check if grub-mkstandalone is available
-        if subprocess.run(['which', 'grub-mkstandalone'], capture_output=True).returncode != 0:
+        if shutil.which('grub-mkstandalone') is None:
             logger.warning("grub-mkstandalone not found - cannot build GRUB EFI")
             return False
 
@@ -634,8 +1453,9 @@ menuentry "Boot from Network (NBD)" {{
 }}
 """
 
+        # Identical on every start for the same server address, so a restart leaves the file alone
         grub_cfg_path = Path(f"{TFTP_ROOT}/grub.cfg")
-        grub_cfg_path.write_text(grub_config)
+        write_if_changed(grub_cfg_path, grub_config.encode())
         logger.info("✓ GRUB configuration created")
 
     def create_pxe_config(self):
@@ -661,261 +1481,543 @@ LABEL local
 """
 
         config_path = Path(f"{TFTP_ROOT}/pxelinux.cfg/default")
-        config_path.write_text(config)
+        write_if_changed(config_path, config.encode())
         logger.info("PXE configuration created")
 
-    def extract_kernel_initrd(self):
-        """Extract kernel and initrd from qcow2 image"""
-        logger.info("Extracting kernel and initrd from qcow2 image")
-
-        nbd_device = '/dev/nbd15'
-        mount_point = Path('/mnt/pxeboot_temp')
-
+    def _extract_kernel_initrd_guestfs(self):
+        """Extract kernel and initrd from qcow2 image in-process with libguestfs"""
+        g = guestfs.GuestFS(python_return_dict=True)
         try:
-            # Load NBD kernel module
-            subprocess.run(['modprobe', 'nbd', 'max_part=16'], check=True)
-            logger.info("NBD module loaded")
+            g.add_drive_opts(str(self.qcow2_path), readonly=1, format='qcow2')
+            g.launch()
 
-            # Connect qcow2 to NBD device
-            subprocess.run(
-                ['qemu-nbd', '--connect=' + nbd_device, '-f', 'qcow2', str(self.qcow2_path)],
-                check=True
-            )
-            logger.info(f"QCOW2 connected to {nbd_device}")
+            roots = g.inspect_os()
+            if not roots:
+                raise Exception("libguestfs found no operating system in the image")
 
-            # Wait for kernel to detect partitions
-            time.sleep(3)
+            # Mount the guest filesystems the way its fstab does, shortest mountpoint first,
+            # so a separate /boot (or LVM root) is handled without any help from the host
+            mountpoints = g.inspect_get_mountpoints(roots[0])
+            for mountpoint in sorted(mountpoints, key=len):
+                try:
+                    g.mount_ro(mountpoints[mountpoint], mountpoint)
+                except RuntimeError as e:
+                    logger.warning(f"Could not mount {mountpoint} from the image: {e}")
 
-            # Use fdisk to find partitions
-            result = subprocess.run(
-                ['fdisk', '-l', nbd_device],
-                capture_output=True,
-                text=True
-            )
-            logger.info(f"Partition table:\n{result.stdout}")
-
-            # Parse partition table to find boot partition
-            partitions = []
-            for line in result.stdout.split('\n'):
-                if nbd_device in line and ('Linux' in line or '*' in line):
-                    parts = line.split()
-                    if parts:
-                        partition = parts[0]
-                        partitions.append(partition)
-
-            if not partitions:
-                # Try to find any partition
-                partitions = [f"{nbd_device}p{i}" for i in range(1, 4)
-                             if Path(f"{nbd_device}p{i}").exists()]
-
-            if not partitions:
-                raise Exception(f"No partitions found on {nbd_device}")
-
-            logger.info(f"Found partitions: {partitions}")
-
-            # Always check for LVM - don't rely on blkid detection
-            logger.info("Checking for LVM volumes...")
-
-            # Scan for volume groups
-            subprocess.run(['vgscan', '--mknodes'], check=False, capture_output=True)
-            subprocess.run(['vgchange', '-ay'], check=False, capture_output=True)
-
-            # Give LVM time to create device nodes
-            time.sleep(2)
-
-            # List logical volumes
-            lv_result = subprocess.run(
-                ['lvs', '--noheadings', '-o', 'lv_path'],
-                capture_output=True,
-                text=True
-            )
+            boot_dir = '/boot' if g.is_dir('/boot') else '/'
+            names = g.ls(boot_dir)
+            logger.info(f"Looking for kernel in {boot_dir} (libguestfs)")
 
-            lvm_detected = False
-            if lv_result.returncode == 0 and lv_result.stdout.strip():
-                lv_paths = [lv.strip() for lv in lv_result.stdout.strip().split('\n') if lv.strip()]
-                if lv_paths:
-                    lvm_detected = True
-                    logger.info(f"✓ Found LVM logical volumes: {lv_paths}")
-                    # Prepend LVM volumes to try them first
-                    partitions = lv_paths + partitions
-                else:
-                    logger.info("No LVM logical volumes found")
-            else:
-                logger.info("No LVM detected (this is fine for non-LVM images)")
+            # Use the newest kernel/initrd if multiple exist
+            kernel_files = fnmatch.filter(names, 'vmlinuz-*') or fnmatch.filter(names, 'vmlinuz')
+            if not kernel_files:
+                raise FileNotFoundError(f"Kernel (vmlinuz) not found in {boot_dir}")
+            kernel_src = max(kernel_files)
+            g.download(f"{boot_dir.rstrip('/')}/{kernel_src}", f"{TFTP_ROOT}/vmlinuz")
+            logger.info(f"Kernel copied: {kernel_src}")
+
+            initrd_files = []
+            for pattern in ['initramfs-*.img', 'initrd.img-*', 'initrd-*']:
+                initrd_files.extend(fnmatch.filter(names, pattern))
+            if not initrd_files:
+                raise FileNotFoundError(f"Initrd (initramfs) not found in {boot_dir}")
+            initrd_src = max(initrd_files)
+            g.download(f"{boot_dir.rstrip('/')}/{initrd_src}", f"{TFTP_ROOT}/initrd.img")
+            logger.info(f"Initrd copied: {initrd_src}")
 
-            # Create mount point
-            mount_point.mkdir(parents=True, exist_ok=True)
+            g.umount_all()
+            g.shutdown()
+        finally:
+            g.close()
 
-            # Try mounting each partition until we find /boot
-            mounted_partition = None
-            for partition in partitions:
-                if not partition or not Path(partition).exists():
-                    continue
+        logger.info("Kernel and initrd extracted successfully")
 
+    def _prefetch_boot_files(self):
+        """Ask the kernel to start reading vmlinuz and initrd.img into the page cache"""
+        # Readahead runs in the background while NBD, TFTP and HTTP start up, so
+        # the first booting client is not the one waiting on the disk
+        for filename in ('vmlinuz', 'initrd.img'):
+            try:
+                fd = os.open(f"{TFTP_ROOT}/{filename}", os.O_RDONLY)
                 try:
-                    logger.info(f"Trying to mount {partition}...")
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.warning(f"Could not prefetch {filename}: {e}")
 
-                    # Try to get filesystem type first
-                    fs_result = subprocess.run(
-                        ['blkid', '-s', 'TYPE', '-o', 'value', partition],
+    def extract_kernel_initrd(self):
+        """Extract kernel and initrd from qcow2 image"""
+        logger.info("Extracting kernel and initrd from qcow2 image")
+
+        # libguestfs reads the image inside its own appliance: no nbd module, qemu-nbd
+        # connection, partition scan, LVM activation or host mounts to set up and tear down
+        if guestfs is not None:
+            try:
+                self._extract_kernel_initrd_guestfs()
+                self._prefetch_boot_files()
+                return
+            except Exception as e:
+                logger.warning(f"libguestfs extraction failed, falling back to NBD: {e}")
+
+        nbd_device = '/dev/nbd15'
+        mount_point = Path('/mnt/pxeboot_temp')
+
+        def remove_mount_point():
+            try:
+                mount_point.rmdir()
+            except OSError:
+                pass
+
+        try:
+            with contextlib.ExitStack() as cleanup:
+                # Load NBD kernel module
+                subprocess.run(['modprobe', 'nbd', 'max_part=16'], check=True)
+                logger.info("NBD module loaded")
+
+                # Connect qcow2 to NBD device
+                subprocess.run(
+                    ['qemu-nbd', '--connect=' + nbd_device, '-f', 'qcow2', str(self.qcow2_path)],
+                    check=True
+                )
+                logger.info(f"QCOW2 connected to {nbd_device}")
+
+                # Teardown is registered as each step succeeds, so it runs exactly once and in
+                # reverse order whether extraction finishes or fails part way through.
+                # LVM is only deactivated if we activated it.
+                has_lvm_pv = False
+                cleanup.callback(lambda: self._disconnect_nbd(nbd_device, deactivate_lvm=has_lvm_pv))
+
+                # Wait for kernel to detect partitions - usually well under a second, give up after 10s
+                scanned_partitions = wait_for_partitions(nbd_device)
+
+                # Partitions and their filesystem types from one structured lsblk call
+                result = subprocess.run(
+                    ['lsblk', '--json', '--paths', '-o', 'NAME,FSTYPE', nbd_device],
+                    capture_output=True,
+                    text=True
+                )
+                fs_types = {}
+                if result.returncode == 0 and result.stdout:
+                    for child in json.loads(result.stdout)['blockdevices'][0].get('children', []):
+                        fs_types[child['name']] = child.get('fstype') or ''
+                logger.info(f"Partition table: {fs_types}")
+
+                # Swap can never hold the kernel
+                partitions = [partition for partition, fs_type in fs_types.items() if fs_type != 'swap']
+
+                if not partitions:
+                    # Try to find any partition
+                    partitions = scanned_partitions
+
+                if not partitions:
+                    raise Exception(f"No partitions found on {nbd_device}")
+
+                logger.info(f"Found partitions: {partitions}")
+
+                def fs_type_of(device):
+                    # lsblk's type comes from udev, which may not have seen this device yet (and
+                    # LVM volumes are not in its list). Then probe with blkid -p so the answer comes
+                    # from the device itself, not blkid's cache, which may predate this qemu-nbd connection.
+                    fs_type = fs_types.get(device)
+                    if not fs_type:
+                        fs_type = subprocess.run(
+                            ['blkid', '-p', '-s', 'TYPE', '-o', 'value', device],
+                            capture_output=True,
+                            text=True
+                        ).stdout.strip()
+                    return fs_type
+
+                # Only pay for the LVM scan (and its settle delay) when a partition is an LVM PV
+                has_lvm_pv = any(fs_type_of(partition) == 'LVM2_member' for partition in partitions)
+
+                if has_lvm_pv:
+                    logger.info("Checking for LVM volumes...")
+
+                    # Scan for volume groups
+                    subprocess.run(['vgscan', '--mknodes'], check=False, capture_output=True)
+                    subprocess.run(['vgchange', '-ay'], check=False, capture_output=True)
+
+                    # Give LVM time to create device nodes
+                    time.sleep(2)
+
+                    # List logical volumes
+                    lv_result = subprocess.run(
+                        ['lvs', '--noheadings', '-o', 'lv_path'],
                         capture_output=True,
                         text=True
                     )
-                    fs_type = fs_result.stdout.strip()
-                    if fs_type:
-                        logger.info(f"  Filesystem type: {fs_type}")
 
-                    # Skip swap partitions
-                    if fs_type == 'swap':
-                        logger.info(f"  Skipping swap partition")
-                        continue
+                    if lv_result.returncode == 0 and lv_result.stdout.strip():
+                        lv_paths = [lv.strip() for lv in lv_result.stdout.strip().split('\n') if lv.strip()]
+                        if lv_paths:
+                            logger.info(f"✓ Found LVM logical volumes: {lv_paths}")
+                            # Prepend LVM volumes to try them first
+                            partitions = lv_paths + partitions
+                        else:
+                            logger.info("No LVM logical volumes found")
+                    else:
+                        logger.info("No LVM volumes activated")
+                else:
+                    logger.info("No LVM physical volumes found (this is fine for non-LVM images)")
 
-                    subprocess.run(
-                        ['mount', '-o', 'ro', partition, str(mount_point)],
-                        check=True,
-                        capture_output=True
-                    )
+                # Create mount point
+                mount_point.mkdir(parents=True, exist_ok=True)
+                cleanup.callback(remove_mount_point)
 
-                    # Check if /boot exists or if we're at root with /boot
-                    boot_dir = mount_point / 'boot'
-                    if boot_dir.exists() or list(mount_point.glob('vmlinuz-*')):
-                        mounted_partition = partition
-                        logger.info(f"Successfully mounted {partition}")
-                        break
-                    else:
-                        # Not the right partition, unmount and try next
-                        subprocess.run(['umount', str(mount_point)], check=False)
+                # Try mounting each partition until we find /boot
+                mounted_partition = None
+                for partition in partitions:
+                    if not partition or not Path(partition).exists():
+                        continue
 
-                except subprocess.CalledProcessError as e:
-                    logger.warning(f"Failed to mount {partition}: {e}")
-                    continue
+                    try:
+                        logger.info(f"Trying to mount {partition}...")
+
+                        # Try to get filesystem type first
+                        fs_type = fs_type_of(partition)
+                        if fs_type:
+                            logger.info(f"  Filesystem type: {fs_type}")
+
+                        # Skip swap partitions
+                        if fs_type == 'swap':
+                            logger.info(f"  Skipping swap partition")
+                            continue
+
+                        subprocess.run(
+                            ['mount', '-o', 'ro', partition, str(mount_point)],
+                            check=True,
+                            capture_output=True
+                        )
+
+                        # Check if /boot exists or if we're at root with /boot
+                        boot_dir = mount_point / 'boot'
+                        if boot_dir.exists() or fnmatch.filter(list_dir_names(mount_point), 'vmlinuz-*'):
+                            mounted_partition = partition
+                            cleanup.callback(umount, mount_point, MNT_DETACH)
+                            logger.info(f"Successfully mounted {partition}")
+                            break
+                        else:
+                            # Not the right partition, unmount and try next
+                            try:
+                                umount(mount_point)
+                            except OSError as e:
+                                logger.warning(f"Failed to unmount {partition}: {e}")
+
+                    except subprocess.CalledProcessError as e:
+                        logger.warning(f"Failed to mount {partition}: {e}")
+                        continue
 
-            if not mounted_partition:
-                raise Exception("Could not find partition with kernel files")
+                if not mounted_partition:
+                    raise Exception("Could not find partition with kernel files")
 
-            # Find kernel and initrd
-            boot_dir = mount_point / 'boot'
-            if not boot_dir.exists():
-                boot_dir = mount_point
+                # Find kernel and initrd
+                boot_dir = mount_point / 'boot'
+                if not boot_dir.exists():
+                    boot_dir = mount_point
 
-            logger.info(f"Looking for kernel in {boot_dir}")
+                logger.info(f"Looking for kernel in {boot_dir}")
 
-            # Copy kernel
-            kernel_files = list(boot_dir.glob('vmlinuz-*')) or list(boot_dir.glob('vmlinuz'))
-            if kernel_files:
-                # Use the newest kernel if multiple exist
-                kernel_src = sorted(kernel_files)[-1]
-                kernel_dst = Path(f"{TFTP_ROOT}/vmlinuz")
-                subprocess.run(['cp', str(kernel_src), str(kernel_dst)], check=True)
-                logger.info(f"Kernel copied: {kernel_src.name}")
-            else:
-                raise FileNotFoundError(f"Kernel (vmlinuz) not found in {boot_dir}")
+                # One directory listing, matched against every pattern below
+                names = list_dir_names(boot_dir)
 
-            # Copy initrd
-            initrd_patterns = ['initramfs-*.img', 'initrd.img-*', 'initrd-*']
-            initrd_files = []
-            for pattern in initrd_patterns:
-                initrd_files.extend(list(boot_dir.glob(pattern)))
-
-            if initrd_files:
-                # Use the newest initrd if multiple exist
-                initrd_src = sorted(initrd_files)[-1]
-                initrd_dst = Path(f"{TFTP_ROOT}/initrd.img")
-                subprocess.run(['cp', str(initrd_src), str(initrd_dst)], check=True)
-                logger.info(f"Initrd copied: {initrd_src.name}")
-            else:
-                raise FileNotFoundError(f"Initrd (initramfs) not found in {boot_dir}")
+                # Find kernel
+                kernel_files = fnmatch.filter(names, 'vmlinuz-*') or fnmatch.filter(names, 'vmlinuz')
+                if kernel_files:
+                    # Use the newest kernel if multiple exist
+                    kernel_src = boot_dir / max(kernel_files)
+                else:
+                    raise FileNotFoundError(f"Kernel (vmlinuz) not found in {boot_dir}")
 
-            # Unmount and disconnect
-            subprocess.run(['umount', str(mount_point)], check=True)
+                # Find initrd
+                initrd_patterns = ['initramfs-*.img', 'initrd.img-*', 'initrd-*']
+                initrd_files = []
+                for pattern in initrd_patterns:
+                    initrd_files.extend(fnmatch.filter(names, pattern))
 
-            # Deactivate LVM if it was used
-            if lvm_detected:
-                subprocess.run(['vgchange', '-an'], check=False, capture_output=True)
+                if initrd_files:
+                    # Use the newest initrd if multiple exist
+                    initrd_src = boot_dir / max(initrd_files)
+                else:
+                    raise FileNotFoundError(f"Initrd (initramfs) not found in {boot_dir}")
 
-            subprocess.run(['qemu-nbd', '--disconnect', nbd_device], check=True)
-            mount_point.rmdir()
+                # Both come off the NBD device, copy them side by side rather than one after the other
+                copy_files([
+                    (kernel_src, Path(f"{TFTP_ROOT}/vmlinuz")),
+                    (initrd_src, Path(f"{TFTP_ROOT}/initrd.img")),
+                ])
+                logger.info(f"Kernel copied: {kernel_src.name}")
+                logger.info(f"Initrd copied: {initrd_src.name}")
 
             logger.info("Kernel and initrd extracted successfully")
+            self._prefetch_boot_files()
 
         except Exception as e:
             logger.error(f"Failed to extract kernel/initrd: {e}")
-            logger.error("Attempting cleanup...")
-            subprocess.run(['umount', str(mount_point)], check=False)
-            subprocess.run(['vgchange', '-an'], check=False, capture_output=True)
-            subprocess.run(['qemu-nbd', '--disconnect', nbd_device], check=False)
-            if mount_point.exists():
-                try:
-                    mount_point.rmdir()
-                except:
-                    pass
             raise
 
-    def start_nbd_server(self):
-        """Start qemu-nbd server to export qcow2 image"""
-        logger.info(f"Starting NBD server on port {NBD_PORT}")
+    def _disconnect_nbd(self, nbd_device, deactivate_lvm):
+        """Disconnect the NBD device, deactivating LVM volumes on it first in the same fork"""
+        if deactivate_lvm:
+            cmd = ['sh', '-c', 'vgchange -an >/dev/null 2>&1; exec qemu-nbd --disconnect "$1"', 'sh', nbd_device]
+        else:
+            cmd = ['qemu-nbd', '--disconnect', nbd_device]
+        result = subprocess.run(cmd)
+        if result.returncode != 0:
+            logger.warning(f"Failed to disconnect {nbd_device} (exit status {result.returncode})")
+
+    def convert_image_to_raw(self):
+        """Convert the qcow2 image to raw once, so NBD requests skip qcow2 cluster lookups"""
+        raw_path = Path(RAW_IMAGE_PATH)
+
+        # Reuse an earlier conversion unless the qcow2 has changed since
+        if raw_path.exists() and raw_path.stat().st_mtime >= self.qcow2_path.stat().st_mtime:
+            logger.info(f"Using existing raw image: {raw_path}")
+        else:
+            logger.info(f"Converting {self.qcow2_path} to raw image {raw_path}")
+            tmp_path = raw_path.with_suffix('.raw.tmp')
+            subprocess.run(
+                ['qemu-img', 'convert', '-O', 'raw', str(self.qcow2_path), str(tmp_path)],
+                check=True
+            )
+            tmp_path.rename(raw_path)
 
-        cmd = [
-            'qemu-nbd',
-            '--persistent',
-            '-f', 'qcow2',
-            str(self.qcow2_path),
-            '--bind', self.server_ip,
-            '--port', str(NBD_PORT),
-            '--fork'
-        ]
+        self.nbd_image = raw_path
+        self.nbd_image_format = 'raw'
 
+    def start_nbd_server(self):
+        """Start the NBD server exporting the image, nbdkit for a raw copy if it is installed"""
+        logger.info(f"Starting NBD server on port {NBD_PORT}")
         try:
-            subprocess.run(cmd, check=True)
-            logger.info(f"NBD server started: {self.server_ip}:{NBD_PORT}")
+            self._spawn_nbd_process()
+            # A bad image or a busy port makes the NBD server exit straight away. Only blocked on here,
+            # before the event loop runs; restarts hear about early exits through the pidfd.
+            try:
+                returncode = self.nbd_process.wait(timeout=1)
+                raise subprocess.CalledProcessError(returncode, self.nbd_process.args)
+            except subprocess.TimeoutExpired:
+                pass
+            logger.info(f"NBD server ({self.nbd_process.args[0]}) started: {self.server_ip}:{NBD_PORT}")
         except subprocess.CalledProcessError as e:
+            self._unwatch_nbd_process()
             logger.error(f"Failed to start NBD server: {e}")
             raise
 
+    def _spawn_nbd_process(self):
+        """Launch qemu-nbd or nbdkit and watch it, without waiting on it"""
+        if self.nbd_image_format == 'raw' and shutil.which('nbdkit'):
+            # A raw image needs no format driver: nbdkit's file plugin serves every client
+            # from the one page-cache copy of it, without qemu-nbd's one-client-at-a-time default
+            cmd = [
+                'nbdkit',
+                '--foreground',
+                '--ipaddr', self.server_ip,
+                '--port', str(NBD_PORT),
+                'file', f'file={self.nbd_image}',
+            ]
+        else:
+            cmd = [
+                'qemu-nbd',
+                '--persistent',
+                '-f', self.nbd_image_format,
+                str(self.nbd_image),
+                '--bind', self.server_ip,
+                '--port', str(NBD_PORT),
+            ]
+
+        # Kept as our child instead of --fork, so shutdown can stop exactly this process
+        self.nbd_process = subprocess.Popen(cmd)
+        self.nbd_started_at = time.monotonic()
+        self._watch_nbd_process()
+
+    def _watch_nbd_process(self):
+        """Have the event loop wake up if the NBD server exits, via a pidfd rather than polling"""
+        try:
+            self.nbd_pidfd = os.pidfd_open(self.nbd_process.pid)
+        except OSError as e:
+            logger.warning(f"Cannot watch {self.nbd_process.args[0]} for unexpected exits: {e}")
+            return
+        self.selector.register(self.nbd_pidfd, selectors.EVENT_READ, self._handle_nbd_exit)
+
+    def _unwatch_nbd_process(self):
+        if self.nbd_pidfd is None:
+            return
+        try:
+            self.selector.unregister(self.nbd_pidfd)
+        except (KeyError, ValueError, RuntimeError):
+            pass  # Selector already closed during shutdown
+        os.close(self.nbd_pidfd)
+        self.nbd_pidfd = None
+
+    def _handle_nbd_exit(self):
+        """Schedule a restart of the NBD server if it dies, booted clients have their root filesystem on it"""
+        self._unwatch_nbd_process()
+        returncode = self.nbd_process.wait()  # Already exited, the pidfd said so
+        now = time.monotonic()
+        if now - self.nbd_started_at >= NBD_STABLE_SECONDS:
+            self.nbd_restart_delay = NBD_RESTART_DELAY
+        delay = self.nbd_restart_delay
+        # Back off while it keeps dying, a bad image would otherwise respawn it in a tight loop
+        self.nbd_restart_delay = min(delay * 2, NBD_RESTART_DELAY_MAX)
+        self.nbd_restart_at = now + delay
+        logger.error(f"{self.nbd_process.args[0]} exited unexpectedly with status {returncode}, restarting it in {delay:g}s")
+
+    def _restart_nbd_server(self):
+        """Run from the event loop once a scheduled restart is due"""
+        self.nbd_restart_at = None
+        try:
+            self._spawn_nbd_process()
+        except OSError as e:
+            logger.error(f"NBD export is unavailable: {e}")
+            return
+        logger.info(f"NBD server ({self.nbd_process.args[0]}) restarted: {self.server_ip}:{NBD_PORT}")
+
     def stop_nbd_server(self):
-        """Stop qemu-nbd server"""
+        """Stop the NBD server"""
         logger.info("Stopping NBD server")
-        # Kill all qemu-nbd processes
-        subprocess.run(['pkill', '-9', 'qemu-nbd'], check=False)
+        self.nbd_restart_at = None
+        self._unwatch_nbd_process()
+        if self.nbd_process and self.nbd_process.poll() is None:
+            self.nbd_process.terminate()
+            try:
+                self.nbd_process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.nbd_process.kill()
+                self.nbd_process.wait()
 
     def start_tftp_server(self):
         """Start TFTP server"""
         logger.info(f"Starting TFTP server on port {TFTP_PORT}")
 
+        # tftp-hpa moves every DATA/ACK round trip out of Python, prefer it when installed.
+        # It has no windowsize option (RFC 7440), the built-in server below does.
+        tftpd = shutil.which('in.tftpd')
+        if tftpd:
+            cmd = [
+                tftpd,
+                '--foreground',
+                '--listen',
+                '--address', f"{self.server_ip}:{TFTP_PORT}",
+                '--secure', TFTP_ROOT,
+            ]
+            self.tftp_process = subprocess.Popen(cmd)
+            # Not waited on: if it fails to start or dies later, the pidfd wakes the event loop
+            # and the built-in server takes over the port
+            try:
+                self.tftp_pidfd = os.pidfd_open(self.tftp_process.pid)
+            except OSError as e:
+                logger.warning(f"Cannot watch in.tftpd for exits ({e}), using the built-in TFTP server")
+                self.tftp_process.terminate()
+                self.tftp_process.wait()
+                self.tftp_process = None
+            else:
+                self.selector.register(self.tftp_pidfd, selectors.EVENT_READ, self._handle_tftpd_exit)
+                logger.info(f"TFTP server (in.tftpd) started: {self.server_ip}:{TFTP_PORT}")
+                return
+
+        self._start_builtin_tftp_server()
+
+    def _start_builtin_tftp_server(self):
+        """Serve TFTP from the event loop with TFTPServer"""
         try:
-            self.tftp_server = tftpy.TftpServer(TFTP_ROOT)
-            # Run in a thread
-            tftp_thread = threading.Thread(
-                target=self.tftp_server.listen,
-                args=(self.server_ip, TFTP_PORT),
-                daemon=True
-            )
-            tftp_thread.start()
+            self.tftp_server = TFTPServer(TFTP_ROOT, self.server_ip, self.selector)
+            self.tftp_server.start()
+            # The kernel and initrd are the bulk of every boot, have them mapped and in the page cache up front,
+            # along with the boot configs every client asks for first. None of them change while we run.
+            self.tftp_server.preload(['vmlinuz', 'initrd.img', 'pxelinux.cfg/default', 'grub.cfg'])
             logger.info(f"TFTP server started: {self.server_ip}:{TFTP_PORT}")
         except Exception as e:
             logger.error(f"Failed to start TFTP server: {e}")
             raise
 
+    def _unwatch_tftpd_process(self):
+        if self.tftp_pidfd is None:
+            return
+        try:
+            self.selector.unregister(self.tftp_pidfd)
+        except (KeyError, ValueError, RuntimeError):
+            pass  # Selector already closed during shutdown
+        os.close(self.tftp_pidfd)
+        self.tftp_pidfd = None
+
+    def _handle_tftpd_exit(self):
+        """Replace in.tftpd with the built-in server when it exits, clients still need their bootloader"""
+        self._unwatch_tftpd_process()
+        returncode = self.tftp_process.wait()  # Already exited, the pidfd said so
+        self.tftp_process = None
+        logger.warning(f"in.tftpd exited with status {returncode}, switching to the built-in TFTP server")
+        try:
+            self._start_builtin_tftp_server()
+        except Exception:
+            pass  # Logged already, DHCP, HTTP and NBD carry on without TFTP
+
     def start_http_server(self):
         """Start HTTP server"""
         logger.info(f"Starting HTTP server on port {HTTP_PORT}")
 
+        # Imported here, http.server pulls in email/html/mimetypes (~30ms) that the
+        # root and requirements checks would otherwise pay for before failing fast
+        from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
         class QuietHTTPHandler(SimpleHTTPRequestHandler):
             def __init__(self, *args, **kwargs):
                 super().__init__(*args, directory=HTTP_ROOT, **kwargs)
 
+            corked = False
+
+            def end_headers(self):
+                # Hold the headers back so they go out in the same segment as the start of the file
+                self._set_cork(True)
+                super().end_headers()
+
+            def handle_one_request(self):
+                # HEAD, 304s, errors and redirects never reach copyfile(), uncork once the
+                # response is written whatever it was, or keep-alive would hold it for 200ms
+                try:
+                    super().handle_one_request()
+                finally:
+                    self._set_cork(False)
+
+            def _set_cork(self, on):
+                if self.corked != on:
+                    try:
+                        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, int(on))
+                    except OSError:
+                        return # Client already gone
+                    self.corked = on
+
+            def copyfile(self, source, outputfile):
+                # Kernel and initrd go straight from the page cache to the socket with sendfile(2),
+                # instead of copyfileobj reading them through a Python buffer. Headers are already
+                # written, wfile is unbuffered.
+                try:
+                    self.connection.sendfile(source)
+                finally:
+                    self._set_cork(False)
+
+            def log_request(self, code='-', size='-'):
+                # Successful requests are the common case, return before anything is formatted
+                if isinstance(code, int) and 200 <= code < 300:
+                    return
+                super().log_request(code, size)
+
             def log_message(self, format, *args):
-                # Only log errors
-                if args[1][0] != '2':
-                    logger.info(f"HTTP: {format % args}")
+                # Only reached for errors and non-2xx responses now
+                logger.info("HTTP: %s", format % args)
 
         try:
-            self.http_server = HTTPServer((self.server_ip, HTTP_PORT), QuietHTTPHandler)
-            self.http_thread = threading.Thread(
-                target=self.http_server.serve_forever,
-                daemon=True
+            self.http_server = ThreadingHTTPServer((self.server_ip, HTTP_PORT), QuietHTTPHandler)
+            # Accepts are driven by the event loop; a spurious wake-up makes accept() raise
+            # BlockingIOError, which _handle_request_noblock already ignores. Each connection is
+            # then served on its own thread, so a client pulling a large image never stalls
+            # DHCP, TFTP or the other HTTP clients. Daemon threads so shutdown does not wait on them.
+            self.http_server.daemon_threads = True
+            self.http_server.socket.setblocking(False)
+            self.selector.register(
+                self.http_server.socket,
+                selectors.EVENT_READ,
+                self.http_server._handle_request_noblock
             )
-            self.http_thread.start()
             logger.info(f"HTTP server started: http://{self.server_ip}:{HTTP_PORT}")
         except Exception as e:
             logger.error(f"Failed to start HTTP server: {e}")
@@ -933,22 +2035,18 @@ LABEL local
             NETMASK
         )
 
-        dhcp_thread = threading.Thread(
-            target=self.dhcp_server.start,
-            daemon=True
-        )
-        dhcp_thread.start()
-        logger.info(f"DHCP server started: {DHCP_RANGE_START} - {DHCP_RANGE_END}")
+        if self.dhcp_server.start():
+            self.selector.register(self.dhcp_server.sock, selectors.EVENT_READ, self.dhcp_server.handle_readable)
+            logger.info(f"DHCP server started: {DHCP_RANGE_START} - {DHCP_RANGE_END}")
 
     def start(self):
         """Start all PXE boot services"""
-        logger.info("=" * 60)
-        logger.info("Starting PXE Boot Server")
-        logger.info("=" * 60)
+        logger.info("\n".join(["=" * 60, "Starting PXE Boot Server", "=" * 60]))
 
         try:
             # Setup
             self.setup_network()
+            self.pin_to_interface_numa_node()
             self.setup_directories()
             self.copy_bootloader_files()  # BIOS/Legacy bootloader
             self.copy_uefi_bootloader_files()  # UEFI bootloader
@@ -957,32 +2055,37 @@ LABEL local
             self.create_grub_config()  # UEFI config
 
             # Start services
-            self.start_nbd_server()
-            time.sleep(1)  # Give NBD time to start
+            if self.convert_raw:
+                self.convert_image_to_raw()
+            self.start_nbd_server()  # Waits a moment itself to catch the NBD server failing to start
 
             self.start_tftp_server()
             self.start_http_server()
             self.start_dhcp_server()
 
-            logger.info("=" * 60)
-            logger.info("PXE Boot Server is READY")
-            logger.info("=" * 60)
-            logger.info(f"Server IP: {self.server_ip}")
-            logger.info(f"Network: {NETWORK_SUBNET}")
-            logger.info(f"DHCP Range: {DHCP_RANGE_START} - {DHCP_RANGE_END}")
-            logger.info(f"NBD Export: {self.server_ip}:{NBD_PORT}")
-            logger.info("")
-            logger.info("Boot Modes Supported:")
-            logger.info("  ✓ BIOS/Legacy (lpxelinux.0)")
-            logger.info("  ✓ UEFI x64 (grubx64.efi)")
-            logger.info("")
-            logger.info("Connect a client via ethernet and PXE boot it")
-            logger.info("Press Ctrl+C to stop")
-            logger.info("=" * 60)
-
-            # Keep running
-            while True:
-                time.sleep(1)
+            # One record, so the banner is written in one go and cannot interleave with other log lines
+            logger.info("\n".join([
+                "=" * 60,
+                "PXE Boot Server is READY",
+                "=" * 60,
+                f"Server IP: {self.server_ip}",
+                f"Network: {NETWORK_SUBNET}",
+                f"DHCP Range: {DHCP_RANGE_START} - {DHCP_RANGE_END}",
+                f"NBD Export: {self.server_ip}:{NBD_PORT}",
+                "",
+                "Boot Modes Supported:",
+                "  ✓ BIOS/Legacy (lpxelinux.0)",
+                "  ✓ UEFI x64 (grubx64.efi)",
+                "",
+                "Connect a client via ethernet and PXE boot it",
+                "Press Ctrl+C to stop",
+                "=" * 60,
+            ]))
+
+            # Keep running. The loop sleeps in epoll until a socket or TFTP timer needs it,
+            # and SIGTERM (systemd, kill) takes the same clean shutdown path as Ctrl+C.
+            signal.signal(signal.SIGTERM, self._handle_sigterm)
+            self.run_event_loop()
 
         except KeyboardInterrupt:
             logger.info("\nShutdown requested...")
@@ -992,17 +2095,48 @@ LABEL local
         finally:
             self.stop()
 
+    def _handle_sigterm(self, signum, frame):
+        """Turn SIGTERM into the KeyboardInterrupt start() already shuts down on"""
+        raise KeyboardInterrupt
+
+    def run_event_loop(self):
+        """Dispatch DHCP, TFTP and HTTP socket readiness and NBD server/in.tftpd exits until interrupted"""
+        # The only timers are TFTP retransmits and a pending NBD restart, so sleep until the earliest is due
+        while True:
+            # Re-read every pass, the built-in server is started here if in.tftpd exits
+            tftp_server = self.tftp_server
+            timeout = tftp_server.next_timeout() if tftp_server else None
+            if self.nbd_restart_at is not None:
+                nbd_timeout = max(0.0, self.nbd_restart_at - time.monotonic())
+                timeout = nbd_timeout if timeout is None else min(timeout, nbd_timeout)
+            for key, _ in self.selector.select(timeout):
+                key.data()
+            if tftp_server:
+                tftp_server.check_timeouts()
+            if self.nbd_restart_at is not None and time.monotonic() >= self.nbd_restart_at:
+                self._restart_nbd_server()
+
     def stop(self):
         """Stop all services and cleanup"""
         logger.info("Stopping all services...")
 
+        self.selector.close()
+
         # Stop DHCP server
         if self.dhcp_server:
             self.dhcp_server.stop()
 
+        # Stop TFTP server
+        if self.tftp_server:
+            self.tftp_server.stop()
+        self._unwatch_tftpd_process()
+        if self.tftp_process and self.tftp_process.poll() is None:
+            self.tftp_process.terminate()
+            self.tftp_process.wait()
+
         # Stop HTTP server
         if self.http_server:
-            self.http_server.shutdown()
+            self.http_server.server_close()
 
         # Stop NBD server
         self.stop_nbd_server()
@@ -1010,14 +2144,19 @@ LABEL local
         logger.info("All services stopped")
 
 
-def check_requirements():
+def check_requirements(convert_raw=False):
     """Check if required tools are installed"""
-    required_commands = ['qemu-nbd', 'ip', 'modprobe', 'fdisk', 'blkid']
+    required_commands = ['qemu-nbd', 'ip', 'modprobe', 'lsblk', 'blkid']
+    if convert_raw:
+        required_commands.append('qemu-img')  # Makes the raw copy, same packages as qemu-nbd
     optional_commands = ['vgscan', 'vgchange', 'lvs']  # LVM tools
 
+    # PATH lookups in-process; read PATH once rather than on every probe
+    search_path = os.environ.get('PATH', os.defpath)
+
     missing = []
     for cmd in required_commands:
-        if subprocess.run(['which', cmd], capture_output=True).returncode != 0:
+        if shutil.which(cmd, path=search_path) is None:
             missing.append(cmd)
 
     if missing:
@@ -1031,7 +2170,7 @@ def check_requirements():
     # Check for LVM tools (optional but recommended)
     lvm_missing = []
     for cmd in optional_commands:
-        if subprocess.run(['which', cmd], capture_output=True).returncode != 0:
+        if shutil.which(cmd, path=search_path) is None:
             lvm_missing.append(cmd)
 
     if lvm_missing:
@@ -1042,26 +2181,12 @@ def check_requirements():
         logger.warning("  Fedora/RHEL:   sudo dnf install lvm2")
         logger.warning("")
 
-    # Check for syslinux files
-    syslinux_paths = [
-        '/usr/lib/syslinux/bios',
-        '/usr/lib/syslinux/modules/bios',
-        '/usr/lib/syslinux',
-        '/usr/share/syslinux',
-        '/usr/lib/PXELINUX',
-    ]
+    # Check for syslinux files, copy_bootloader_files() reuses this scan
+    index = syslinux_index()
+    found_files = [f for f in SYSLINUX_FILES if f in index]
 
-    required_files = ['lpxelinux.0', 'ldlinux.c32', 'menu.c32', 'libutil.c32']
-    found_files = []
-
-    for filename in required_files:
-        for search_path in syslinux_paths:
-            if Path(search_path, filename).exists():
-                found_files.append(filename)
-                break
-
-    if len(found_files) < len(required_files):
-        missing_syslinux = set(required_files) - set(found_files)
+    if len(found_files) < len(SYSLINUX_FILES):
+        missing_syslinux = [f for f in SYSLINUX_FILES if f not in index]
         logger.warning(f"Missing syslinux files: {', '.join(missing_syslinux)}")
         logger.warning("Install syslinux package:")
         logger.warning("  Debian/Ubuntu: sudo apt install syslinux-common pxelinux")
@@ -1120,6 +2245,12 @@ def main():
         'qcow2_image',
         help='Path to qcow2 disk image'
     )
+    parser.add_argument(
+        '--convert-raw',
+        action='store_true',
+        help=f'Export a raw copy of the image ({RAW_IMAGE_PATH}) instead of the qcow2 itself. '
+             'Cheaper per NBD request, and served by nbdkit if it is installed. Client writes then land in the copy, not the qcow2'
+    )
 
     args = parser.parse_args()
 
@@ -1129,12 +2260,17 @@ def main():
         sys.exit(1)
 
     # Check requirements
-    if not check_requirements():
+    if not check_requirements(convert_raw=args.convert_raw):
         sys.exit(1)
 
-    # Create and start server
-    server = PXEBootServer(args.interface, args.qcow2_image)
-    server.start()
+    # From here on the event loop logs per packet; stopping the listener flushes what is still queued
+    log_listener = start_log_listener()
+    try:
+        # Create and start server
+        server = PXEBootServer(args.interface, args.qcow2_image, convert_raw=args.convert_raw)
+        server.start()
+    finally:
+        log_listener.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,270 @@
+"""
+Tests for network-boot-server.py's DHCP packet handling
+
+Run from the repository root with:
+    python3 -m unittest discover tests
+"""
+
+import importlib.util
+import logging
+import random
+import socket
+import struct
+import unittest
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'network-boot-server.py'
+
+
+def load_script():
+    """Import network-boot-server.py, its name is not a valid module name"""
+    spec = importlib.util.spec_from_file_location('network_boot_server', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+nbs = load_script()
+logging.getLogger('PXEBootServer').setLevel(logging.CRITICAL)
+
+
+def reference_parse_dhcp_packet(data):
+    """The if/elif option parser that DHCP_OPTION_HANDLERS replaced, kept to compare against"""
+    if len(data) < 240:
+        return None
+
+    mv = memoryview(data)
+    if mv[236:240] != b'\x63\x82\x53\x63':
+        return None
+
+    transaction_id = bytes(mv[4:8])
+    client_mac = bytes(mv[28:34])
+    msg_type = None
+    vendor_class = None
+    requested_ip = None
+    client_arch = None
+
+    i = 240
+    end = len(mv)
+    while i < end:
+        option = mv[i]
+        if option == 255:
+            break
+        if option == 0:
+            i += 1
+            continue
+        if i + 1 >= end:
+            break
+
+        option, option_len = struct.unpack_from("!BB", mv, i)
+        if i + 2 + option_len > end:
+            break
+
+        if option == 53:
+            msg_type = mv[i + 2]
+        elif option == 60:
+            vendor_class = bytes(mv[i + 2:i + 2 + option_len])
+        elif option == 50:
+            requested_ip = bytes(mv[i + 2:i + 6])
+        elif option == 93:
+            if option_len >= 2:
+                client_arch = struct.unpack_from("!H", mv, i + 2)[0]
+
+        if msg_type is not None and vendor_class is not None and client_arch is not None:
+            break
+
+        i += 2 + option_len
+
+    return {
+        'transaction_id': transaction_id,
+        'client_mac': client_mac,
+        'msg_type': msg_type,
+        'vendor_class': vendor_class,
+        'requested_ip': requested_ip,
+        'client_arch': client_arch
+    }
+
+
+def make_request(msg_type=1, mac=b'\x52\x54\x00\x00\x00\x01', xid=b'\x11\x22\x33\x44',
+                 ciaddr=b'\x00' * 4, options=None, cookie=b'\x63\x82\x53\x63'):
+    """A client BOOTREQUEST, options default to a PXE BIOS client's"""
+    packet = bytearray(240)
+    packet[0:3] = b'\x01\x01\x06'
+    packet[4:8] = xid
+    packet[12:16] = ciaddr
+    packet[28:34] = mac
+    packet[236:240] = cookie
+    if options is None:
+        options = (bytes([53, 1, msg_type]) + bytes([60, 20]) + b'PXEClient:Arch:00000'
+                   + bytes([93, 2, 0, 0]) + b'\xff')
+    return bytes(packet + options)
+
+
+def option(code, value):
+    return bytes([code, len(value)]) + value
+
+
+# Request options as sent by real firmware and the edge cases the parser has to survive
+OPTION_CORPUS = [
+    # BIOS PXE DISCOVER (iPXE/SeaBIOS)
+    option(53, b'\x01') + option(57, b'\x05\xc0') + option(93, b'\x00\x00')
+    + option(94, b'\x01\x02\x01') + option(60, b'PXEClient:Arch:00000:UNDI:002001')
+    + option(55, bytes(range(1, 20))) + b'\xff',
+    # UEFI x64 REQUEST with a requested address, vendor class last
+    option(53, b'\x03') + option(50, socket.inet_aton('172.16.172.150')) + option(93, b'\x00\x07')
+    + option(54, socket.inet_aton('172.16.172.1')) + option(60, b'PXEClient:Arch:00007:UNDI:003016') + b'\xff',
+    # initramfs udhcpc DISCOVER, no PXE options
+    option(53, b'\x01') + option(61, b'\x01' + bytes(6)) + option(60, b'udhcp 1.36.1')
+    + option(55, b'\x01\x03\x06\x0c\x0f\x1c\x2a') + b'\xff',
+    # dhclient REQUEST without a vendor class
+    option(53, b'\x03') + option(50, b'\xac\x10\xac\x65') + option(12, b'node-1') + b'\xff',
+    # Pad bytes between options
+    b'\x00\x00' + option(53, b'\x01') + b'\x00' + option(93, b'\x00\x0b') + b'\x00' * 3
+    + option(60, b'PXEClient') + b'\xff',
+    # Everything interesting seen early, trailing garbage must not be read
+    option(53, b'\x01') + option(60, b'PXEClient') + option(93, b'\x00\x06') + b'\x35\xff\xff',
+    # Options after End are ignored
+    option(53, b'\x01') + b'\xff' + option(60, b'PXEClient') + option(93, b'\x00\x07'),
+    # Repeated options, the last one before the early exit wins
+    option(53, b'\x01') + option(53, b'\x03') + option(50, b'\x01\x02\x03\x04')
+    + option(50, b'\x05\x06\x07\x08') + b'\xff',
+    # Short option 93 and 50 values
+    option(53, b'\x01') + option(93, b'\x07') + option(50, b'\x0a\x00') + b'\xff',
+    # Zero-length vendor class
+    option(53, b'\x01') + option(60, b'') + option(93, b'\x00\x00') + b'\xff',
+    # Truncated: option length runs past the end of the packet
+    option(53, b'\x01') + b'\x3c\x20PXE',
+    # Truncated: option code with no length byte
+    option(53, b'\x01') + b'\x3c',
+    # No End option
+    option(53, b'\x01') + option(60, b'PXEClient'),
+    # No options at all
+    b'',
+]
+
+
+def make_corpus():
+    packets = [make_request(options=options) for options in OPTION_CORPUS]
+    packets += [
+        make_request(),
+        make_request(ciaddr=socket.inet_aton('172.16.172.9')),
+        make_request(cookie=b'\x00\x00\x00\x00'),
+        make_request()[:239],
+        b'',
+    ]
+    # Random option soup, seeded so a failure reproduces
+    rng = random.Random(1)
+    codes = [0, 50, 53, 55, 60, 61, 93, 94, 255]
+    for _ in range(500):
+        options = bytearray()
+        for _ in range(rng.randrange(12)):
+            code = rng.choice(codes)
+            if code in (0, 255):
+                options.append(code)
+            else:
+                length = rng.randrange(6)
+                options += bytes([code, length]) + rng.randbytes(length)
+        # Sometimes cut the last option short
+        if options and rng.random() < 0.3:
+            del options[rng.randrange(len(options)):]
+        packets.append(make_request(mac=rng.randbytes(6), xid=rng.randbytes(4), options=bytes(options)))
+    return packets
+
+
+def outcome(parse, packet):
+    """Parsed result, or the exception type, so malformed packets compare too"""
+    try:
+        return parse(packet)
+    except Exception as e:
+        return type(e)
+
+
+def make_dhcp_server(range_end='172.16.172.200'):
+    return nbs.DHCPServer('eth0', '172.16.172.1', '172.16.172.100', range_end, '255.255.255.0')
+
+
+class ParseDhcpPacketTest(unittest.TestCase):
+    def test_matches_reference_parser(self):
+        server = make_dhcp_server()
+        for packet in make_corpus():
+            with self.subTest(packet=packet.hex()):
+                self.assertEqual(outcome(server._parse_dhcp_packet, packet),
+                                 outcome(reference_parse_dhcp_packet, packet))
+
+    def test_accepts_memoryview(self):
+        # UDPBatch hands the parser views into its receive buffers
+        server = make_dhcp_server()
+        packet = make_request(msg_type=3)
+        self.assertEqual(server._parse_dhcp_packet(memoryview(packet)), reference_parse_dhcp_packet(packet))
+
+
+class BuildDhcpPacketTest(unittest.TestCase):
+    def assert_reply(self, reply, xid, mac, ip, msg_type, bootfile):
+        server_ip = socket.inet_aton('172.16.172.1')
+        parsed = reference_parse_dhcp_packet(bytes(reply))
+        self.assertEqual(parsed['transaction_id'], xid)
+        self.assertEqual(parsed['client_mac'], mac)
+        self.assertEqual(parsed['msg_type'], msg_type)
+        self.assertEqual(reply[0], 2)  # BOOTREPLY
+        self.assertEqual(bytes(reply[16:20]), socket.inet_aton(ip))  # yiaddr
+        self.assertEqual(bytes(reply[20:24]), server_ip)  # siaddr, next server
+        self.assertEqual(bytes(reply[108:236]).rstrip(b'\x00'), bootfile.encode())  # file
+
+        options = {}
+        i = 240
+        while reply[i] != 255:
+            options[reply[i]] = bytes(reply[i + 2:i + 2 + reply[i + 1]])
+            i += 2 + reply[i + 1]
+        self.assertEqual(options[54], server_ip)
+        self.assertEqual(options[1], socket.inet_aton('255.255.255.0'))
+        self.assertEqual(options.get(67, b''), bootfile.encode())
+
+    def test_round_trip(self):
+        server = make_dhcp_server()
+        cases = [
+            (b'\x00\x00\x00\x01', b'\x52\x54\x00\x00\x00\x01', '172.16.172.100', server.DHCPOFFER, 'lpxelinux.0'),
+            (b'\x00\x00\x00\x02', b'\x52\x54\x00\x00\x00\x01', '172.16.172.100', server.DHCPACK, 'lpxelinux.0'),
+            (b'\xde\xad\xbe\xef', b'\x52\x54\x00\x00\x00\x02', '172.16.172.101', server.DHCPOFFER, 'grubx64.efi'),
+            (b'\x01\x02\x03\x04', b'\x52\x54\x00\x00\x00\x02', '172.16.172.101', server.DHCPACK, ''),
+            (b'\xff\xff\xff\xff', b'\x52\x54\x00\x00\x00\x01', '10.0.0.9', server.DHCPOFFER, 'grubx64.efi'),
+        ]
+        for xid, mac, ip, msg_type, bootfile in cases:
+            with self.subTest(xid=xid.hex(), bootfile=bootfile):
+                reply = server._build_dhcp_packet(xid, mac, server._ip_to_int(ip), msg_type, bootfile)
+                self.assert_reply(reply, xid, mac, ip, msg_type, bootfile)
+
+    def test_handle_discover_and_request(self):
+        server = make_dhcp_server()
+        mac = b'\x52\x54\x00\x00\x00\x07'
+        offer = bytes(server._handle_packet(make_request(msg_type=1, mac=mac), ('0.0.0.0', 68)))
+        ack = bytes(server._handle_packet(make_request(msg_type=3, mac=mac), ('0.0.0.0', 68)))
+        self.assert_reply(offer, b'\x11\x22\x33\x44', mac, '172.16.172.100', server.DHCPOFFER, 'lpxelinux.0')
+        self.assert_reply(ack, b'\x11\x22\x33\x44', mac, '172.16.172.100', server.DHCPACK, 'lpxelinux.0')
+
+        proxy = bytes(server._handle_packet(
+            make_request(mac=b'\x52\x54\x00\x00\x00\x08', ciaddr=socket.inet_aton('10.1.2.3')), ('10.1.2.3', 68)))
+        self.assert_reply(proxy, b'\x11\x22\x33\x44', b'\x52\x54\x00\x00\x00\x08', '10.1.2.3',
+                          server.DHCPOFFER, 'lpxelinux.0')
+
+
+class LeasePoolTest(unittest.TestCase):
+    def test_same_mac_keeps_its_address(self):
+        server = make_dhcp_server()
+        first = server._allocate_ip(b'\x01' * 6)
+        server._allocate_ip(b'\x02' * 6)
+        self.assertEqual(server._allocate_ip(b'\x01' * 6), first)
+
+    def test_full_pool_reassigns_least_recently_seen(self):
+        server = make_dhcp_server(range_end='172.16.172.102')
+        macs = [bytes([i]) * 6 for i in range(1, 4)]
+        ips = [server._allocate_ip(mac) for mac in macs]
+        self.assertEqual(len(set(ips)), 3)
+
+        server._allocate_ip(macs[0])  # macs[1] is now the quietest client
+        self.assertEqual(server._allocate_ip(b'\x09' * 6), ips[1])
+        self.assertNotIn(macs[1], server._leases)
+        self.assertEqual(server._allocate_ip(macs[0]), ips[0])
+
+
+if __name__ == '__main__':
+    unittest.main()